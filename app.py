@@ -1,37 +1,63 @@
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
-from sklearn.preprocessing import LabelEncoder
 import numpy as np
 import pandas as pd
-import pickle
 import io
 import os
+import threading
 from dashboard.routes import dashboard_bp
+from profiling.routes import profiling_bp
+from profiling.memory import start_tracing, take_snapshot
 # --------------------------
 # IMPORT FUNCTIONAL DB
 # --------------------------
-from data.db import init_db, insert_user_prediction, insert_batch_prediction
+from data.db import init_db, insert_user_prediction, insert_batch_predictions
+from data.result_cache import cache_key, get_cached_result, store_result
+from data.drift import DriftMonitor, build_drift_reference
+from tools.capture import CaptureMiddleware
+from explain import PathExplainer, wants_explanation
+from serialization import FastJSONProvider, parse_profile, compact_prediction, compact_batch
+from predictor import (
+    classify, load_model, model_reference,
+    TOLERANCE, CONFIDENCE_THRESHOLD, OOD_GLOBAL, LOW_CONFIDENCE, REGION_MISMATCH
+)
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "tea_models_project", "ExtraTrees_model.pkl")
+MODEL_PATH = os.environ.get("MODEL_PATH", os.path.join(BASE_DIR, "tea_models_project", "ExtraTrees_model.pkl"))
 DATA_PATH = os.path.join(BASE_DIR, "tea_models_project", "tea_aroma_balanced.csv")
-DB_DIR = os.path.join(os.environ.get("HOME", "/home"), "data")
-os.makedirs(DB_DIR, exist_ok=True)  # make sure folder exists
-DB_PATH = os.path.join(DB_DIR, "database.db")
 
 # --------------------------
 # APP CONFIG
 # --------------------------
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson when available, numpy-aware either way
 CORS(app)
 
 app.config["MAX_CONTENT_LENGTH"] = 2 * 1024 * 1024  # 2 MB limit
+app.config["BATCH_CACHE_ENABLED"] = os.environ.get("BATCH_CACHE_ENABLED", "1") == "1"
+# Re-insert rows into batch_predictions when a cached upload is served again
+app.config["BATCH_CACHE_LOG_DUPLICATES"] = os.environ.get("BATCH_CACHE_LOG_DUPLICATES", "1") == "1"
+# Stop evaluating trees once the outcome is decided (see predictor.py)
+app.config["EARLY_EXIT"] = os.environ.get("EARLY_EXIT", "0") == "1"
 
-# Initialize SQLite DB (creates database.db and tables if not exist)
+# Initialize the prediction store (PREDICTION_STORE, see data/db.py)
 init_db()
 
 app.register_blueprint(dashboard_bp)
 
+# Opt-in profiling endpoints (see profiling/routes.py), only with a token set
+if os.environ.get("PROFILING_TOKEN"):
+    app.register_blueprint(profiling_bp)
+
+# Opt-in traffic capture for `python -m tools.replay`
+if os.environ.get("CAPTURE_DIR"):
+    app.wsgi_app = CaptureMiddleware(
+        app.wsgi_app,
+        os.environ["CAPTURE_DIR"],
+        sample_rate=float(os.environ.get("CAPTURE_SAMPLE_RATE", "1.0")),
+        max_body_bytes=int(os.environ.get("CAPTURE_MAX_BODY_BYTES", 256 * 1024))
+    )
+
 # --------------------------
 # BASE DIR & PATHS
 # --------------------------
@@ -39,42 +65,48 @@ app.register_blueprint(dashboard_bp)
 # --------------------------
 # LOAD MODEL
 # --------------------------
+# PROFILING_TRACEMALLOC=1 keeps snapshots around the model / data loading
+if os.environ.get("PROFILING_TRACEMALLOC") == "1":
+    start_tracing()
+take_snapshot("before_model")
+
 try:
-    with open(MODEL_PATH, "rb") as f:
-        model = pickle.load(f)
+    model, MODEL_VERSION = load_model(MODEL_PATH)
     print("ExtraTrees model loaded successfully")
     MODEL_LOADED = True
 except Exception as e:
     print(f"Model loading error: {e}")
+    MODEL_VERSION = None
     MODEL_LOADED = False
 
+take_snapshot("after_model")
+
 # --------------------------
 # LOAD DATA & ENCODER
 # --------------------------
 data = pd.read_csv(DATA_PATH)
-X_data = data.iloc[:, :-1]
-y_data = data.iloc[:, -1]
 
-encoder = LabelEncoder()
-encoder.fit(y_data)
+# Encoder + global / per-region sensor envelopes (see predictor.py); a
+# retrained model brings its own, saved next to the .pkl
+REFERENCE = model_reference(MODEL_PATH, data=data)
+encoder = REFERENCE["encoder"]
 
 TEA_REGIONS = list(encoder.classes_)
-SENSOR_COLUMNS = X_data.columns.tolist()
-
-# SENSOR RANGE STATISTICS
-GLOBAL_MIN = X_data.min()
-GLOBAL_MAX = X_data.max()
-
-REGION_MIN_MAX = {}
-for region in TEA_REGIONS:
-    subset = data[data.iloc[:, -1] == region].iloc[:, :-1]
-    REGION_MIN_MAX[region] = {
-        "min": subset.min(),
-        "max": subset.max()
-    }
+SENSOR_COLUMNS = REFERENCE["sensor_columns"]
+
+take_snapshot("after_data")
+
+# Per-leaf contribution tables for explain=true (see explain.py)
+explainer = PathExplainer(model, SENSOR_COLUMNS, TEA_REGIONS) if MODEL_LOADED else None
 
-TOLERANCE = 5.0
-CONFIDENCE_THRESHOLD = 0.55
+# Streaming drift statistics, snapshotted to disk for the /drift report
+drift_monitor = None
+if os.environ.get("DRIFT_MONITORING", "1") == "1":
+    drift_monitor = DriftMonitor(build_drift_reference(data, TEA_REGIONS))
+
+# Trees evaluated per request, reported by /health (per worker)
+tree_stats = {"requests": 0, "readings": 0, "trees_evaluated": 0, "request_average_sum": 0.0}
+tree_stats_lock = threading.Lock()
 
 # --------------------------
 # ROUTES
@@ -94,18 +126,115 @@ def model_page():
 # --------------------------
 # HELPER FUNCTIONS
 # --------------------------
-def global_range_check(sensors):
-    for i, val in enumerate(sensors):
-        if val < (GLOBAL_MIN.iloc[i] - TOLERANCE) or val > (GLOBAL_MAX.iloc[i] + TOLERANCE):
-            return False
-    return True
-
-def region_range_check(region, sensors):
-    stats = REGION_MIN_MAX[region]
-    for i, val in enumerate(sensors):
-        if val < (stats["min"].iloc[i] - TOLERANCE) or val > (stats["max"].iloc[i] + TOLERANCE):
-            return False
-    return True
+def run_classify(X):
+    outcome = classify(model, REFERENCE, X, early_exit=app.config["EARLY_EXIT"])
+
+    trees = outcome["trees_evaluated"]
+    scored = trees[trees > 0]
+    if scored.size:
+        with tree_stats_lock:
+            tree_stats["requests"] += 1
+            tree_stats["readings"] += int(scored.size)
+            tree_stats["trees_evaluated"] += int(scored.sum())
+            tree_stats["request_average_sum"] += float(scored.mean())
+    return outcome
+
+def ensemble_fields(outcome, idx):
+    # Only reported in early-exit mode, where probabilities may be partial
+    if not app.config["EARLY_EXIT"]:
+        return {}
+    return {
+        "partial": bool(outcome["partial"][idx]),
+        "trees_evaluated": int(outcome["trees_evaluated"][idx])
+    }
+
+def score_batch(X, outcome=None):
+    """Full /predict-batch payload for readings X, without touching the DB."""
+    results = []
+
+    # One vectorized pass over the whole upload
+    if outcome is None:
+        outcome = run_classify(X)
+
+    for idx in range(len(X)):
+        sensors = X[idx].tolist()
+        reason = outcome["reason"][idx]
+
+        sample = {
+            "sample_index": idx + 1,
+            "input_sensors": sensors,
+            "status": "REJECTED"
+        }
+
+        if reason == OOD_GLOBAL:
+            sample.update({"reason": "OOD_GLOBAL"})
+            results.append(sample)
+            continue
+
+        predicted_region = encoder.classes_[outcome["pred_idx"][idx]]
+        probabilities = outcome["probabilities"][idx]
+        confidence = float(outcome["confidence"][idx])
+        sample.update(ensemble_fields(outcome, idx))
+
+        if reason == LOW_CONFIDENCE:
+            sample.update({"reason": "LOW_CONFIDENCE", "confidence": confidence})
+            results.append(sample)
+            continue
+
+        if reason == REGION_MISMATCH:
+            sample.update({
+                "reason": "REGION_MISMATCH",
+                "predicted_region": predicted_region,
+                "confidence": confidence
+            })
+            results.append(sample)
+            continue
+
+        sample.update({
+            "status": "ACCEPTED",
+            "prediction": predicted_region,
+            "confidence": confidence,
+            "probabilities": dict(zip(encoder.classes_, probabilities))
+        })
+        results.append(sample)
+
+    return {
+        "success": True,
+        "total_samples": len(results),
+        "accepted": sum(r["status"] == "ACCEPTED" for r in results),
+        "rejected": sum(r["status"] == "REJECTED" for r in results),
+        "model": "ExtraTrees",
+        "results": results
+    }
+
+def settled_pred_idx(outcome):
+    # Early exit can stop a LOW_CONFIDENCE row before its top class is settled;
+    # -1 there means "unknown": the explainer picks the full-forest top class
+    # and the drift monitor counts the row in the all-readings group only
+    pred_idx = outcome["pred_idx"].copy()
+    pred_idx[outcome["partial"] & (outcome["reason"] == LOW_CONFIDENCE)] = -1
+    return pred_idx
+
+def attach_explanations(results, X, pred_idx=None):
+    # Every row the model scored gets one; -1 / None explain the top class
+    rows = [i for i, r in enumerate(results) if r.get("reason") != OOD_GLOBAL]
+    if not rows:
+        return
+    class_idx = None if pred_idx is None else np.asarray(pred_idx)[rows]
+    for i, explanation in zip(rows, explainer.explain(X[rows], class_idx)):
+        results[i]["explanation"] = explanation
+
+def log_batch_results(filename, results):
+    # Only accepted rows are logged, in one call to the store
+    insert_batch_predictions(filename, [
+        {
+            "row_dict": {"sensors": r["input_sensors"]},
+            "predicted_region": r["prediction"],
+            "confidence": r["confidence"],
+            "status": r["status"]
+        }
+        for r in results if r["status"] == "ACCEPTED"
+    ])
 
 # --------------------------
 # SINGLE PREDICTION
@@ -116,8 +245,14 @@ def predict():
         return jsonify({"success": False, "error": "Model not loaded"}), 500
 
     try:
+        try:
+            profile, top_k, precision = parse_profile(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+
         payload = request.get_json()
         sensors = payload.get("sensors")
+        explain = wants_explanation(payload.get("explain", request.args.get("explain")))
 
         if not isinstance(sensors, list) or len(sensors) != 7:
             return jsonify({
@@ -127,50 +262,54 @@ def predict():
 
         sensors = [float(v) for v in sensors]
 
+        # ---- MODEL PREDICTION + CHECKS ----
+        X = np.array([sensors])
+        outcome = run_classify(X)
+        reason = outcome["reason"][0]
+
+        if drift_monitor is not None:
+            drift_monitor.update(X, settled_pred_idx(outcome))
+
+        extra = ensemble_fields(outcome, 0) if reason != OOD_GLOBAL else {}
+        if explain and reason != OOD_GLOBAL:
+            extra["explanation"] = explainer.explain(X, settled_pred_idx(outcome))[0]
+
         # ---- GLOBAL OOD CHECK ----
-        if not global_range_check(sensors):
+        if reason == OOD_GLOBAL:
             return jsonify({
                 "success": False,
                 "reason": "OOD_GLOBAL",
                 "error": "Input values are far outside trained sensor ranges"
             }), 422
 
-        X = np.array([sensors])
-
-        # ---- MODEL PREDICTION ----
-        pred_idx = model.predict(X)[0]
-        predicted_region = encoder.inverse_transform([pred_idx])[0]
-        probabilities = model.predict_proba(X)[0]
-        confidence = float(probabilities[pred_idx])
+        predicted_region = encoder.classes_[outcome["pred_idx"][0]]
+        probabilities = outcome["probabilities"][0]
+        confidence = float(outcome["confidence"][0])
 
         # ---- CONFIDENCE CHECK ----
-        if confidence < CONFIDENCE_THRESHOLD:
+        if reason == LOW_CONFIDENCE:
             return jsonify({
                 "success": False,
                 "reason": "LOW_CONFIDENCE",
                 "confidence": confidence,
-                "error": "Low model confidence – unclear region"
+                "error": "Low model confidence – unclear region",
+                **extra
             }), 422
 
         # ---- REGION ENVELOPE CHECK ----
-        if not region_range_check(predicted_region, sensors):
+        if reason == REGION_MISMATCH:
             return jsonify({
                 "success": False,
                 "reason": "REGION_MISMATCH",
                 "predicted_region": predicted_region,
                 "confidence": confidence,
-                "error": "Sensor pattern does not fit predicted region"
+                "error": "Sensor pattern does not fit predicted region",
+                **extra
             }), 422
 
         # ---- SUCCESS: LOG TO DB ----
         status = "ACCEPTED"
 
-        if confidence < CONFIDENCE_THRESHOLD:
-            status = "REJECTED"
-
-        elif not region_range_check(predicted_region, sensors):
-            status = "REJECTED"
-
         insert_user_prediction(
             input_dict={"sensors": sensors},
             predicted_region=predicted_region,
@@ -178,14 +317,20 @@ def predict():
             status=status
         )
 
-        return jsonify({
+        result = {
             "success": True,
             "prediction": predicted_region,
             "confidence": confidence,
             "probabilities": dict(zip(encoder.classes_, probabilities)),
             "input_sensors": sensors,
-            "model": "ExtraTrees"
-        })
+            "model": "ExtraTrees",
+            **extra
+        }
+
+        if profile == "compact":
+            result = compact_prediction(result, TEA_REGIONS, top_k, precision)
+
+        return jsonify(result)
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -199,6 +344,12 @@ def predict_batch():
         return jsonify({"success": False, "error": "Model not loaded"}), 500
 
     try:
+        try:
+            profile, top_k, precision = parse_profile(request.values)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        explain = wants_explanation(request.values.get("explain"))
+
         if "file" not in request.files:
             return jsonify({"error": "No file provided"}), 400
 
@@ -210,7 +361,30 @@ def predict_batch():
         if not file.filename.lower().endswith(".csv"):
             return jsonify({"error": "Only CSV files are accepted"}), 400
 
-        df = pd.read_csv(io.StringIO(file.read().decode("utf-8")))
+        content = file.read()
+
+        # ---- CACHE LOOKUP (same bytes + same model/thresholds) ----
+        use_cache = app.config["BATCH_CACHE_ENABLED"]
+        key_parts = (MODEL_VERSION, TOLERANCE, CONFIDENCE_THRESHOLD)
+        if app.config["EARLY_EXIT"]:
+            key_parts += ("early_exit",)  # partial probabilities differ from full ones
+        key = cache_key(content, *key_parts)
+        cached = get_cached_result(key) if use_cache else None
+
+        if cached is not None:
+            if app.config["BATCH_CACHE_LOG_DUPLICATES"]:
+                log_batch_results(file.filename, cached["results"])
+            if explain:
+                # Explanations aren't cached; the stored sensors are enough to rebuild them
+                X = np.array([r["input_sensors"] for r in cached["results"]], dtype=float)
+                attach_explanations(cached["results"], X)
+            if profile == "compact":
+                cached = compact_batch(cached, TEA_REGIONS, top_k, precision)
+            response = jsonify(cached)
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        df = pd.read_csv(io.StringIO(content.decode("utf-8")))
 
         if df.shape[1] != 7:
             return jsonify({"error": "CSV must contain exactly 7 sensor columns"}), 400
@@ -221,76 +395,26 @@ def predict_batch():
         if len(df) > 500:
             return jsonify({"error": "Maximum 500 samples per upload"}), 400
 
-        results = []
-
-        for idx, row in df.iterrows():
-            sensors = row.values.astype(float).tolist()
-
-            sample = {
-                "sample_index": idx + 1,
-                "input_sensors": sensors,
-                "status": "REJECTED"
-            }
-
-            if not global_range_check(sensors):
-                sample.update({"reason": "OOD_GLOBAL"})
-                results.append(sample)
-                continue
-
-            X = np.array([sensors])
-            pred_idx = model.predict(X)[0]
-            predicted_region = encoder.inverse_transform([pred_idx])[0]
-            probabilities = model.predict_proba(X)[0]
-            confidence = float(probabilities[pred_idx])
-
-            if confidence < CONFIDENCE_THRESHOLD:
-                sample.update({"reason": "LOW_CONFIDENCE", "confidence": confidence})
-                results.append(sample)
-                continue
-
-            if not region_range_check(predicted_region, sensors):
-                sample.update({
-                    "reason": "REGION_MISMATCH",
-                    "predicted_region": predicted_region,
-                    "confidence": confidence
-                })
-                results.append(sample)
-                continue
-
-            # ---- SUCCESS: LOG TO DB ----
-            sample.update({
-                "status": "ACCEPTED",
-                "prediction": predicted_region,
-                "confidence": confidence,
-                "probabilities": dict(zip(encoder.classes_, probabilities))
-            })
+        X = df.values.astype(float)
+        outcome = run_classify(X)
+        if drift_monitor is not None:
+            drift_monitor.update(X, settled_pred_idx(outcome))
 
-            status = "ACCEPTED"
+        payload = score_batch(X, outcome)
+        log_batch_results(file.filename, payload["results"])
 
-            if confidence < CONFIDENCE_THRESHOLD:
-                status = "REJECTED"
+        if use_cache:
+            store_result(key, payload)
 
-            elif not region_range_check(predicted_region, sensors):
-                status = "REJECTED"
+        if explain:
+            attach_explanations(payload["results"], X, settled_pred_idx(outcome))
 
-            insert_batch_prediction(
-                filename=file.filename,
-                row_dict={"sensors": sensors},
-                predicted_region=predicted_region,
-                confidence=confidence,
-                status=status
-            )
+        if profile == "compact":
+            payload = compact_batch(payload, TEA_REGIONS, top_k, precision)
 
-            results.append(sample)
-
-        return jsonify({
-            "success": True,
-            "total_samples": len(results),
-            "accepted": sum(r["status"] == "ACCEPTED" for r in results),
-            "rejected": sum(r["status"] == "REJECTED" for r in results),
-            "model": "ExtraTrees",
-            "results": results
-        })
+        response = jsonify(payload)
+        response.headers["X-Cache"] = "MISS" if use_cache else "BYPASS"
+        return response
 
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
@@ -305,9 +429,22 @@ def health():
         "model_loaded": MODEL_LOADED,
         "regions": TEA_REGIONS,
         "tolerance": TOLERANCE,
-        "confidence_threshold": CONFIDENCE_THRESHOLD
+        "confidence_threshold": CONFIDENCE_THRESHOLD,
+        "early_exit": early_exit_stats()
     })
 
+def early_exit_stats():
+    with tree_stats_lock:
+        stats = dict(tree_stats)
+    request_average_sum = stats.pop("request_average_sum")
+    return {
+        "enabled": app.config["EARLY_EXIT"],
+        "total_trees": len(model.estimators_) if MODEL_LOADED else None,
+        **stats,
+        "avg_trees_per_request": round(request_average_sum / stats["requests"], 2) if stats["requests"] else None,
+        "avg_trees_per_reading": round(stats["trees_evaluated"] / stats["readings"], 2) if stats["readings"] else None
+    }
+
 # --------------------------
 # RUN (LOCAL ONLY – RENDER USES GUNICORN)
 # --------------------------
@@ -1,7 +1,8 @@
 # dashboards/routes.py
 
-from flask import Blueprint, render_template
+from flask import Blueprint, render_template, jsonify
 from data.db import get_region_statistics
+from data.drift import drift_report
 from .map_config import REGION_IFRAMES
 
 dashboard_bp = Blueprint("dashboard", __name__)
@@ -10,5 +11,11 @@ dashboard_bp = Blueprint("dashboard", __name__)
 def dashboard():
     return render_template(
         "map.html",
-        regions=get_region_statistics()
+        regions=get_region_statistics(),
+        drift=drift_report()
     )
+
+# Reads the drift snapshots only, never the prediction log
+@dashboard_bp.route("/drift")
+def drift():
+    return jsonify(drift_report())
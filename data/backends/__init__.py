@@ -0,0 +1,21 @@
+"""Prediction-log storage backends, selected by one spec string:
+
+    sqlite | sqlite:<file> | memory | segment | segment:<directory>
+"""
+from .base import PredictionStore
+from .memory import MemoryStore
+from .segment import SegmentStore
+from .sqlite import SQLiteStore
+
+BACKENDS = ("sqlite", "memory", "segment")
+
+
+def create_store(spec, sqlite_path, segment_dir):
+    name, _, location = spec.partition(":")
+    if name == "sqlite":
+        return SQLiteStore(location or sqlite_path)
+    if name == "memory":
+        return MemoryStore()
+    if name == "segment":
+        return SegmentStore(location or segment_dir)
+    raise ValueError(f"Unknown prediction store '{name}', expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,100 @@
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+
+N_SENSORS = 7
+
+
+class PredictionStore:
+    """Interface implemented by every prediction-log backend.
+
+    Rows returned by the getters have the same keys as the SQLite tables
+    (id, input_data / row_data as JSON text, predicted_region, confidence,
+    status, created_at), newest first.
+    """
+
+    name = None
+
+    def init(self):
+        raise NotImplementedError
+
+    def insert_user_prediction(self, input_dict, predicted_region, confidence, status):
+        raise NotImplementedError
+
+    def insert_batch_prediction(self, filename, row_dict, predicted_region, confidence, status):
+        raise NotImplementedError
+
+    def insert_batch_predictions(self, filename, rows):
+        """rows: iterable of dicts with row_dict, predicted_region, confidence, status."""
+        for row in rows:
+            self.insert_batch_prediction(filename=filename, **row)
+
+    def get_all_user_predictions(self):
+        raise NotImplementedError
+
+    def get_all_batch_predictions(self):
+        raise NotImplementedError
+
+    def get_region_statistics(self):
+        raise NotImplementedError
+
+    def iter_accepted_readings(self, chunk_size=1000):
+        """Yield (X, regions) chunks of the ACCEPTED rows of both tables.
+
+        X is an (m, N_SENSORS) float array, regions the predicted region of
+        each row. This default goes through the getters; backends that can
+        read incrementally override it.
+        """
+        rows = [
+            (r.get("input_data") or r.get("row_data"), r["predicted_region"])
+            for r in self.get_all_user_predictions() + self.get_all_batch_predictions()
+            if r["status"] == "ACCEPTED"
+        ]
+        for start in range(0, len(rows), chunk_size):
+            yield readings_chunk(rows[start:start + chunk_size])
+
+    def close(self):
+        pass
+
+
+# --------------------------
+# Helpers shared by the non-SQL backends
+# --------------------------
+def utc_timestamp(ts=None):
+    """Same text format as SQLite's CURRENT_TIMESTAMP."""
+    dt = datetime.now(timezone.utc) if ts is None else datetime.fromtimestamp(ts, timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def readings_chunk(rows):
+    """(X, regions) from (JSON sensor text, region) pairs; malformed rows are skipped."""
+    X, regions = [], []
+    for data, region in rows:
+        try:
+            sensors = [float(v) for v in json.loads(data)["sensors"]]
+        except (TypeError, ValueError, KeyError):
+            continue
+        if len(sensors) == N_SENSORS:
+            X.append(sensors)
+            regions.append(region)
+    return np.array(X, dtype=float).reshape(-1, N_SENSORS), regions
+
+
+def format_region_statistics(totals):
+    """totals: {region: [total, accepted, confidence_sum, confidence_count]}."""
+    rows = []
+    # NULL sorts first, as in SQL GROUP BY
+    for region in sorted(totals, key=lambda r: (r is not None, r or "")):
+        total, accepted, conf_sum, conf_count = totals[region]
+        if total <= 0:
+            continue
+        avg = conf_sum / conf_count if conf_count else None
+        rows.append({
+            "region": region,
+            "total": total,
+            "accepted": accepted,
+            "rejected": total - accepted,
+            "avg_confidence": round(avg, 3) if avg else None
+        })
+    return rows
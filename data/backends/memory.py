@@ -0,0 +1,67 @@
+import json
+import threading
+from collections import defaultdict
+
+from .base import PredictionStore, format_region_statistics, utc_timestamp
+
+
+class MemoryStore(PredictionStore):
+    """Process-local store for tests and benchmarks; nothing is persisted."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {"user_predictions": [], "batch_predictions": []}
+
+    def init(self):
+        print("[INFO] Using in-memory prediction store")
+
+    def _append(self, table, row):
+        with self._lock:
+            rows = self._tables[table]
+            row["id"] = len(rows) + 1
+            row["created_at"] = utc_timestamp()
+            rows.append(row)
+
+    def insert_user_prediction(self, input_dict, predicted_region, confidence, status):
+        self._append("user_predictions", {
+            "input_data": json.dumps(input_dict),
+            "predicted_region": predicted_region,
+            "confidence": confidence,
+            "status": status
+        })
+
+    def insert_batch_prediction(self, filename, row_dict, predicted_region, confidence, status):
+        self._append("batch_predictions", {
+            "filename": filename,
+            "row_data": json.dumps(row_dict),
+            "predicted_region": predicted_region,
+            "confidence": confidence,
+            "status": status
+        })
+
+    def _newest_first(self, table):
+        with self._lock:
+            rows = list(self._tables[table])
+        # Latest insert first within the same second, as the SQLite index scan returns them
+        return [dict(r) for r in sorted(reversed(rows), key=lambda r: r["created_at"], reverse=True)]
+
+    def get_all_user_predictions(self):
+        return self._newest_first("user_predictions")
+
+    def get_all_batch_predictions(self):
+        return self._newest_first("batch_predictions")
+
+    def get_region_statistics(self):
+        totals = defaultdict(lambda: [0, 0, 0.0, 0])
+        with self._lock:
+            rows = self._tables["user_predictions"] + self._tables["batch_predictions"]
+        for r in rows:
+            t = totals[r["predicted_region"]]
+            t[0] += 1
+            t[1] += 1 if r["status"] == "ACCEPTED" else 0
+            if r["confidence"] is not None:
+                t[2] += r["confidence"]
+                t[3] += 1
+        return format_region_statistics(totals)
@@ -0,0 +1,325 @@
+"""Append-only binary segment store for high-ingest logging.
+
+Layout under the store directory:
+
+    strings.tsv                            <id>\\t<json string>, append-only
+    <table>/<writer>-<seq>.seg             fixed-width records (RECORD)
+    <table>/<writer>-<seq>.seg.idx         per-region totals of a sealed segment
+
+Every process writes to its own segments (writer = "<pid>-<start time>"),
+so workers never contend on a file. Region, status and filename are stored
+as 64-bit hashes of the string, and the hash -> string table is kept in
+strings.tsv. Ids therefore agree across processes without coordination.
+When a segment reaches max_segment_bytes it is sealed. A background thread
+then writes its .idx file, and get_region_statistics() reads those small
+files instead of rescanning old data.
+"""
+import hashlib
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from .base import N_SENSORS, PredictionStore, format_region_statistics
+RECORD = np.dtype([
+    ("created_at", "<f8"),           # unix seconds, UTC
+    ("confidence", "<f8"),           # NaN for NULL
+    ("sensors", "<f8", (N_SENSORS,)),
+    ("region", "<u8"),               # string ids, 0 for NULL
+    ("status", "<u8"),
+    ("filename", "<u8"),
+])
+_PACK = struct.Struct("<dd%ddQQQ" % N_SENSORS)  # same layout as RECORD
+
+TABLES = {"user_predictions": "input_data", "batch_predictions": "row_data"}
+NULL_ID = 0
+
+
+def string_id(value):
+    if value is None:
+        return NULL_ID
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+ACCEPTED_ID = string_id("ACCEPTED")
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        return True  # no cheap check; leave the segment to be scanned
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SegmentStore(PredictionStore):
+    name = "segment"
+
+    def __init__(self, directory, max_segment_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_segment_records = max(1, max_segment_bytes // RECORD.itemsize)
+        self._writer_id = f"{os.getpid()}-{int(time.time())}"
+        self._lock = threading.Lock()
+        self._active = {}          # table -> [fd, path, records]
+        self._seq = 0
+        self._strings = {NULL_ID: None}
+        self._strings_fd = None
+        self._index_cache = {}     # sealed segment path -> totals
+        self._index_queue = queue.Queue()
+        self._indexer = None
+
+    # --------------------------
+    # Setup
+    # --------------------------
+    @property
+    def _strings_path(self):
+        return os.path.join(self.directory, "strings.tsv")
+
+    def init(self):
+        for table in TABLES:
+            os.makedirs(os.path.join(self.directory, table), exist_ok=True)
+        self._load_strings()
+
+        if self._indexer is None:
+            self._indexer = threading.Thread(
+                target=self._index_worker, name="segment-indexer", daemon=True
+            )
+            self._indexer.start()
+
+        # Segments left behind by writers that are gone are sealed too
+        for table in TABLES:
+            for path in self._segments(table):
+                writer = os.path.basename(path).rsplit("-", 1)[0]
+                if os.path.exists(path + ".idx") or writer == self._writer_id:
+                    continue
+                if not _pid_alive(int(writer.split("-")[0])):
+                    self._index_queue.put(path)
+
+        print(f"[INFO] Segment store initialized at: {self.directory}")
+
+    def close(self):
+        with self._lock:
+            for table in list(self._active):
+                self._seal(table)
+            if self._strings_fd is not None:
+                os.close(self._strings_fd)
+                self._strings_fd = None
+        self._index_queue.join()
+
+    # --------------------------
+    # String table
+    # --------------------------
+    def _load_strings(self):
+        if not os.path.exists(self._strings_path):
+            return
+        with open(self._strings_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # partial write from a crash
+                sid, value = line.rstrip("\n").split("\t", 1)
+                self._strings[int(sid)] = json.loads(value)
+
+    def _intern(self, value):
+        sid = string_id(value)
+        if sid not in self._strings:
+            if self._strings_fd is None:
+                self._strings_fd = os.open(
+                    self._strings_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+                )
+            os.write(self._strings_fd, f"{sid}\t{json.dumps(value)}\n".encode("utf-8"))
+            self._strings[sid] = value
+        return sid
+
+    def _lookup(self, sid):
+        if sid not in self._strings:
+            self._load_strings()  # written by another process
+        return self._strings.get(sid)
+
+    # --------------------------
+    # Writing
+    # --------------------------
+    def _segments(self, table):
+        folder = os.path.join(self.directory, table)
+        return sorted(
+            os.path.join(folder, name) for name in os.listdir(folder) if name.endswith(".seg")
+        )
+
+    def _open_segment(self, table):
+        self._seq += 1
+        path = os.path.join(self.directory, table, f"{self._writer_id}-{self._seq:06d}.seg")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._active[table] = [fd, path, 0]
+        return self._active[table]
+
+    def _seal(self, table):
+        fd, path, _ = self._active.pop(table)
+        os.close(fd)
+        self._index_queue.put(path)
+
+    def _pack(self, sensors_dict, predicted_region, confidence, status, filename, now):
+        sensors = sensors_dict.get("sensors") if isinstance(sensors_dict, dict) else None
+        if sensors is None or len(sensors) != N_SENSORS:
+            raise ValueError(f"segment store records exactly {N_SENSORS} sensors per row")
+        return _PACK.pack(
+            now,
+            float("nan") if confidence is None else float(confidence),
+            *(float(v) for v in sensors),
+            self._intern(predicted_region),
+            self._intern(status),
+            self._intern(filename),
+        )
+
+    def _append(self, table, records):
+        with self._lock:
+            now = time.time()
+            payload = b"".join(self._pack(*r, now=now) for r in records)
+            active = self._active.get(table) or self._open_segment(table)
+            os.write(active[0], payload)  # one write per call keeps records whole
+            active[2] += len(records)
+            if active[2] >= self.max_segment_records:
+                self._seal(table)
+
+    def insert_user_prediction(self, input_dict, predicted_region, confidence, status):
+        self._append("user_predictions", [(input_dict, predicted_region, confidence, status, None)])
+
+    def insert_batch_prediction(self, filename, row_dict, predicted_region, confidence, status):
+        self._append("batch_predictions", [(row_dict, predicted_region, confidence, status, filename)])
+
+    def insert_batch_predictions(self, filename, rows):
+        records = [
+            (r["row_dict"], r["predicted_region"], r["confidence"], r["status"], filename)
+            for r in rows
+        ]
+        if records:
+            self._append("batch_predictions", records)
+
+    # --------------------------
+    # Reading
+    # --------------------------
+    @staticmethod
+    def _read_segment(path):
+        # A torn final record (crash mid-write) is ignored
+        count = os.path.getsize(path) // RECORD.itemsize
+        return np.fromfile(path, dtype=RECORD, count=count)
+
+    @staticmethod
+    def _aggregate(records):
+        totals = {}
+        if len(records) == 0:
+            return totals
+        regions, inverse = np.unique(records["region"], return_inverse=True)
+        accepted = np.bincount(inverse, weights=records["status"] == ACCEPTED_ID, minlength=len(regions))
+        has_conf = ~np.isnan(records["confidence"])
+        conf_sum = np.bincount(inverse, weights=np.where(has_conf, records["confidence"], 0.0),
+                               minlength=len(regions))
+        conf_count = np.bincount(inverse, weights=has_conf, minlength=len(regions))
+        counts = np.bincount(inverse, minlength=len(regions))
+        for i, sid in enumerate(regions.tolist()):
+            totals[sid] = [int(counts[i]), int(accepted[i]), float(conf_sum[i]), int(conf_count[i])]
+        return totals
+
+    def _segment_totals(self, path):
+        if path in self._index_cache:
+            return self._index_cache[path]
+        try:
+            with open(path + ".idx", "r", encoding="utf-8") as f:
+                index = json.load(f)
+            totals = {int(sid): v for sid, v in index["regions"].items()}
+            self._index_cache[path] = totals
+            return totals
+        except (FileNotFoundError, ValueError):
+            return self._aggregate(self._read_segment(path))  # active or not yet indexed
+
+    def _index_worker(self):
+        while True:
+            path = self._index_queue.get()
+            try:
+                records = self._read_segment(path)
+                index = {
+                    "records": int(len(records)),
+                    "min_created_at": float(records["created_at"].min()) if len(records) else None,
+                    "max_created_at": float(records["created_at"].max()) if len(records) else None,
+                    "regions": {str(sid): v for sid, v in self._aggregate(records).items()},
+                }
+                tmp_path = f"{path}.idx.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(index, f)
+                os.replace(tmp_path, path + ".idx")
+            except Exception as e:
+                print(f"[WARN] Could not index segment {path}: {e}")
+            finally:
+                self._index_queue.task_done()
+
+    def _get_all(self, table):
+        arrays = [self._read_segment(p) for p in self._segments(table)]
+        records = np.concatenate(arrays) if arrays else np.empty(0, dtype=RECORD)
+
+        # ids follow arrival order; rows come back newest first like the SQL getters
+        order = np.argsort(records["created_at"], kind="stable")
+        records = records[order]
+        created = np.datetime_as_string(
+            (records["created_at"] * 1e6).astype("datetime64[us]"), unit="s"
+        )
+
+        data_column = TABLES[table]
+        # Plain lists are much faster to walk than numpy records
+        sensors = records["sensors"].tolist()
+        confidence = records["confidence"].tolist()
+        region = records["region"].tolist()
+        status = records["status"].tolist()
+        filename = records["filename"].tolist()
+        created = created.tolist()
+
+        rows = []
+        for i in range(len(records) - 1, -1, -1):
+            row = {
+                "id": i + 1,
+                data_column: json.dumps({"sensors": sensors[i]}),
+                "predicted_region": self._lookup(region[i]),
+                "confidence": None if confidence[i] != confidence[i] else confidence[i],
+                "status": self._lookup(status[i]),
+                "created_at": created[i].replace("T", " "),
+            }
+            if table == "batch_predictions":
+                row["filename"] = self._lookup(filename[i])
+            rows.append(row)
+        return rows
+
+    def get_all_user_predictions(self):
+        return self._get_all("user_predictions")
+
+    def get_all_batch_predictions(self):
+        return self._get_all("batch_predictions")
+
+    def iter_accepted_readings(self, chunk_size=1000):
+        # One segment in memory at a time
+        for table in TABLES:
+            for path in self._segments(table):
+                records = self._read_segment(path)
+                records = records[records["status"] == ACCEPTED_ID]
+                for start in range(0, len(records), chunk_size):
+                    chunk = records[start:start + chunk_size]
+                    yield (
+                        np.array(chunk["sensors"], dtype=float),
+                        [self._lookup(sid) for sid in chunk["region"].tolist()],
+                    )
+
+    def get_region_statistics(self):
+        totals = defaultdict(lambda: [0, 0, 0.0, 0])
+        for table in TABLES:
+            for path in self._segments(table):
+                for sid, values in self._segment_totals(path).items():
+                    t = totals[self._lookup(sid)]
+                    for k in range(4):
+                        t[k] += values[k]
+        return format_region_statistics(totals)
@@ -0,0 +1,216 @@
+import json
+import os
+import sqlite3
+
+from .base import PredictionStore, readings_chunk
+
+# archived_region_statistics key for rows without a region. A NULL key would
+# never hit ON CONFLICT (SQLite treats NULLs as distinct), so rollups for those
+# rows would pile up instead of being added together.
+NULL_REGION = ""
+
+
+class SQLiteStore(PredictionStore):
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row  # allows dict-like access
+        return conn
+
+    # Initialize DB
+    def init(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        # Only takes effect on a fresh file; existing databases are switched
+        # over once with `python -m data.retention enable-vacuum`.
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                input_data TEXT NOT NULL,
+                predicted_region TEXT,
+                confidence REAL,
+                status TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS batch_predictions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filename TEXT,
+                row_data TEXT NOT NULL,
+                predicted_region TEXT,
+                confidence REAL,
+                status TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Running totals for rows moved out by data/retention.py, so region
+        # statistics stay correct after the live tables are pruned.
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS archived_region_statistics (
+                predicted_region TEXT NOT NULL PRIMARY KEY,
+                total INTEGER NOT NULL DEFAULT 0,
+                accepted INTEGER NOT NULL DEFAULT 0,
+                confidence_sum REAL NOT NULL DEFAULT 0,
+                confidence_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_user_predictions_created_at
+            ON user_predictions (created_at)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_batch_predictions_created_at
+            ON batch_predictions (created_at)
+        """)
+
+        conn.commit()
+        conn.close()
+        print(f"[INFO] Database initialized at: {self.path}")
+
+    # --------------------------
+    # Inserts
+    # --------------------------
+    def insert_user_prediction(self, input_dict, predicted_region, confidence, status):
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            INSERT INTO user_predictions
+            (input_data, predicted_region, confidence, status)
+            VALUES (?, ?, ?, ?)
+        """, (
+            json.dumps(input_dict),
+            predicted_region,
+            confidence,
+            status
+        ))
+
+        conn.commit()
+        conn.close()
+
+    def insert_batch_prediction(self, filename, row_dict, predicted_region, confidence, status):
+        self.insert_batch_predictions(filename, [{
+            "row_dict": row_dict,
+            "predicted_region": predicted_region,
+            "confidence": confidence,
+            "status": status
+        }])
+
+    def insert_batch_predictions(self, filename, rows):
+        # One connection and one transaction for the whole upload
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        cursor.executemany("""
+            INSERT INTO batch_predictions
+            (filename, row_data, predicted_region, confidence, status)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (
+                filename,
+                json.dumps(r["row_dict"]),
+                r["predicted_region"],
+                r["confidence"],
+                r["status"]
+            )
+            for r in rows
+        ])
+
+        conn.commit()
+        conn.close()
+
+    # --------------------------
+    # Queries
+    # --------------------------
+    def _fetch_all(self, sql):
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+
+    def get_all_user_predictions(self):
+        return self._fetch_all("SELECT * FROM user_predictions ORDER BY created_at DESC")
+
+    def get_all_batch_predictions(self):
+        return self._fetch_all("SELECT * FROM batch_predictions ORDER BY created_at DESC")
+
+    def iter_accepted_readings(self, chunk_size=1000):
+        # fetchmany keeps only one chunk of rows in memory at a time
+        conn = self.connect()
+        try:
+            cursor = conn.execute("""
+                SELECT input_data AS data, predicted_region FROM user_predictions
+                WHERE status = 'ACCEPTED'
+                UNION ALL
+                SELECT row_data, predicted_region FROM batch_predictions
+                WHERE status = 'ACCEPTED'
+            """)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield readings_chunk(rows)
+        finally:
+            conn.close()
+
+    # Statistics per region (live rows + archived totals)
+    def get_region_statistics(self):
+        conn = self.connect()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT
+                predicted_region,
+                SUM(total) as total,
+                SUM(accepted) as accepted,
+                SUM(confidence_sum) / SUM(confidence_count) as avg_confidence
+            FROM (
+                SELECT
+                    predicted_region,
+                    COUNT(*) as total,
+                    SUM(CASE WHEN status='ACCEPTED' THEN 1 ELSE 0 END) as accepted,
+                    TOTAL(confidence) as confidence_sum,
+                    COUNT(confidence) as confidence_count
+                FROM (
+                    SELECT predicted_region, status, confidence FROM user_predictions
+                    UNION ALL
+                    SELECT predicted_region, status, confidence FROM batch_predictions
+                )
+                GROUP BY predicted_region
+
+                UNION ALL
+
+                SELECT NULLIF(predicted_region, ?), total, accepted, confidence_sum, confidence_count
+                FROM archived_region_statistics
+            )
+            GROUP BY predicted_region
+            HAVING SUM(total) > 0
+        """, (NULL_REGION,))
+
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [
+            {
+                "region": r["predicted_region"],
+                "total": r["total"],
+                "accepted": r["accepted"],
+                "rejected": r["total"] - r["accepted"],
+                "avg_confidence": round(r["avg_confidence"], 3) if r["avg_confidence"] else None
+            }
+            for r in rows
+        ]
@@ -1,4 +1,7 @@
-from db import get_all_user_predictions, get_all_batch_predictions, get_region_statistics
+# Run from the repo root: python -m data.check_db
+from data.db import init_db, get_all_user_predictions, get_all_batch_predictions, get_region_statistics
+
+init_db()
 
 print("=== User Predictions ===")
 for row in get_all_user_predictions():
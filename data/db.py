@@ -1,145 +1,82 @@
 import os
-import sqlite3
-from datetime import datetime
-import json
 
-# DB Path Setup 
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) 
-DB_PATH = os.path.join(BASE_DIR, "Data", "database.db") # Helper to get connection 
+from data.backends import SQLiteStore, create_store
 
-def get_connection(): 
-    conn = sqlite3.connect(DB_PATH) 
-    conn.row_factory = sqlite3.Row # allows dict-like access 
-    return conn
+# --------------------------
+# Store selection
+# --------------------------
+# One value picks the backend and, optionally, where it keeps its data:
+#   PREDICTION_STORE=sqlite                      (default, at DB_PATH)
+#   PREDICTION_STORE=sqlite:/path/to/file.db
+#   PREDICTION_STORE=memory                      (tests / benchmarks)
+#   PREDICTION_STORE=segment[:/path/to/dir]      (append-only, high ingest)
+DATA_DIR = os.path.join(os.environ.get("HOME", "/home"), "data")
+DB_PATH = os.path.join(DATA_DIR, "database.db")
+SEGMENT_DIR = os.path.join(DATA_DIR, "segments")
+PREDICTION_STORE = os.environ.get("PREDICTION_STORE", "sqlite")
+
+_store = None
+
+
+def configure(spec=None):
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = create_store(spec or PREDICTION_STORE, DB_PATH, SEGMENT_DIR)
+    return _store
+
+
+def get_store():
+    if _store is None:
+        configure()
+    return _store
+
+
+# Raw SQLite connection, for SQLite-only maintenance such as data/retention.py
+def get_connection():
+    store = get_store()
+    if not isinstance(store, SQLiteStore):
+        raise RuntimeError(f"get_connection() needs the sqlite store, not '{store.name}'")
+    return store.connect()
 
 # Initialize DB
 def init_db():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS user_predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            input_data TEXT NOT NULL,
-            predicted_region TEXT,
-            confidence REAL,
-            status TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS batch_predictions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            filename TEXT,
-            row_data TEXT NOT NULL,
-            predicted_region TEXT,
-            confidence REAL,
-            status TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    conn.commit()
-    conn.close()
-    print(f"[INFO] Database initialized at: {DB_PATH}")
+    get_store().init()
 
 # --------------------------
 # Insert single prediction
 # --------------------------
 def insert_user_prediction(input_dict, predicted_region, confidence, status):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO user_predictions 
-        (input_data, predicted_region, confidence, status)
-        VALUES (?, ?, ?, ?)
-    """, (
-        json.dumps(input_dict),
-        predicted_region,
-        confidence,
-        status
-    ))
-
-    conn.commit()
-    conn.close()
+    get_store().insert_user_prediction(input_dict, predicted_region, confidence, status)
 
 # --------------------------
 # Insert batch predictions
 # --------------------------
 def insert_batch_prediction(filename, row_dict, predicted_region, confidence, status):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO batch_predictions
-        (filename, row_data, predicted_region, confidence, status)
-        VALUES (?, ?, ?, ?, ?)
-    """, (
-        filename,
-        json.dumps(row_dict),
-        predicted_region,
-        confidence,
-        status
-    ))
-
-    conn.commit()
-    conn.close()
+    get_store().insert_batch_prediction(filename, row_dict, predicted_region, confidence, status)
 
+def insert_batch_predictions(filename, rows):
+    get_store().insert_batch_predictions(filename, rows)
 
 # --------------------------
 # Query all user predictions
 # --------------------------
 def get_all_user_predictions():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM user_predictions ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return get_store().get_all_user_predictions()
 
 # --------------------------
 # Query all batch predictions
 # --------------------------
 def get_all_batch_predictions():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM batch_predictions ORDER BY created_at DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    return get_store().get_all_batch_predictions()
 
 
 # Query to get statistics per region
 def get_region_statistics():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT
-            predicted_region,
-            COUNT(*) as total,
-            SUM(CASE WHEN status='ACCEPTED' THEN 1 ELSE 0 END) as accepted,
-            AVG(confidence) as avg_confidence
-        FROM (
-            SELECT predicted_region, status, confidence FROM user_predictions
-            UNION ALL
-            SELECT predicted_region, status, confidence FROM batch_predictions
-        )
-        GROUP BY predicted_region
-    """)
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "region": r["predicted_region"],
-            "total": r["total"],
-            "accepted": r["accepted"],
-            "rejected": r["total"] - r["accepted"],
-            "avg_confidence": round(r["avg_confidence"], 3) if r["avg_confidence"] else None
-        }
-        for r in rows
-    ]
\ No newline at end of file
+    return get_store().get_region_statistics()
+
+# --------------------------
+# Stream accepted readings (retraining)
+# --------------------------
+def iter_accepted_readings(chunk_size=1000):
+    return get_store().iter_accepted_readings(chunk_size)
@@ -0,0 +1,330 @@
+"""Streaming sensor-drift statistics.
+
+DriftMonitor keeps running statistics for every sensor, both over all
+readings and per predicted region. Each reading updates a Welford
+mean/variance and a 10-bin histogram whose edges are the training
+deciles, so the cost per reading is constant whatever the traffic.
+
+Every SNAPSHOT_INTERVAL seconds each worker writes its state to
+DRIFT_DIR/drift-<pid>-<start>-<period>.json, and reference.json holds the
+training-side numbers. Each worker starts fresh statistics (a new period
+file) every DRIFT_WINDOW / PERIODS_PER_WINDOW seconds. drift_report()
+merges only the periods that began within the last DRIFT_WINDOW seconds,
+so old traffic cannot average a recent drift away. Older files are
+deleted. The report compares the merged state with the training
+distribution:
+  - PSI of the live histogram against the training decile shares
+  - standardized mean shift, (live mean - train mean) / train std
+It reads only these files, never the prediction log.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from data.db import DATA_DIR
+
+DRIFT_DIR = os.environ.get("DRIFT_SNAPSHOT_DIR", os.path.join(DATA_DIR, "drift"))
+SNAPSHOT_INTERVAL = float(os.environ.get("DRIFT_SNAPSHOT_INTERVAL", 60))
+DRIFT_WINDOW = float(os.environ.get("DRIFT_WINDOW", 24 * 3600))   # seconds covered by the report
+PERIODS_PER_WINDOW = 4
+N_BINS = 10
+ALL_KEY = "__all__"
+
+MIN_SAMPLES = 30        # below this a key is reported as "insufficient"
+PSI_WARN = 0.1
+PSI_DRIFT = 0.25
+SHIFT_WARN = 1.0        # in training standard deviations
+SHIFT_DRIFT = 2.0
+_EPS = 1e-4             # floor for empty bins in PSI
+
+
+# --------------------------
+# Training reference
+# --------------------------
+def build_drift_reference(data, regions):
+    """Decile edges and per-key expected shares / moments from the training frame."""
+    X = data.iloc[:, :-1].values.astype(float)
+    y = data.iloc[:, -1].values
+    keys = [ALL_KEY] + list(regions)
+
+    # Inner edges only; the outer bins are open-ended
+    edges = np.quantile(X, np.linspace(0, 1, N_BINS + 1)[1:-1], axis=0).T   # (sensors, N_BINS - 1)
+
+    expected, mean, std, count = [], [], [], []
+    for key in keys:
+        subset = X if key == ALL_KEY else X[y == key]
+        expected.append(_histogram(subset, edges) / max(len(subset), 1))
+        mean.append(subset.mean(axis=0))
+        std.append(subset.std(axis=0, ddof=1))
+        count.append(len(subset))
+
+    return {
+        "keys": keys,
+        "sensors": data.columns[:-1].tolist(),
+        "edges": edges.tolist(),
+        "expected": np.array(expected).tolist(),
+        "mean": np.array(mean).tolist(),
+        "std": np.array(std).tolist(),
+        "count": count,
+    }
+
+
+def _bins(X, edges):
+    # Bin index of every value: how many of its sensor's 9 inner edges it reaches
+    return (X[:, :, None] >= edges[None, :, :]).sum(axis=2)
+
+
+def _count_bins(bins, n_sensors):
+    # Offset each sensor into its own block of N_BINS, then one bincount
+    flat = (bins + np.arange(n_sensors) * N_BINS).ravel()
+    return np.bincount(flat, minlength=n_sensors * N_BINS).reshape(n_sensors, N_BINS)
+
+
+def _histogram(X, edges):
+    return _count_bins(_bins(X, edges), X.shape[1])
+
+
+def _period_start(path):
+    # drift-<pid>-<start>-<period>.json; files without a period use <start>
+    return int(os.path.basename(path)[:-len(".json")].split("-")[-1])
+
+
+def prune_snapshots(snapshot_dir=DRIFT_DIR, window=DRIFT_WINDOW, now=None):
+    """Delete period files that began before the window; returns the rest."""
+    cutoff = (now or time.time()) - window
+    kept = []
+    for path in glob.glob(os.path.join(snapshot_dir, "drift-*.json")):
+        try:
+            expired = _period_start(path) < cutoff
+        except ValueError:
+            continue  # not one of ours
+        if not expired:
+            kept.append(path)
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker got there first
+    return kept
+
+
+def _write_json(path, obj):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+# --------------------------
+# Streaming state
+# --------------------------
+def _empty_state(n_keys, n_sensors):
+    return {
+        "n": np.zeros((n_keys, n_sensors)),
+        "mean": np.zeros((n_keys, n_sensors)),
+        "m2": np.zeros((n_keys, n_sensors)),
+        "hist": np.zeros((n_keys, n_sensors, N_BINS)),
+    }
+
+
+def _merge_into(state, k, n_b, mean_b, m2_b, hist_b):
+    """Chan et al. parallel Welford merge of (n_b, mean_b, m2_b) into row k."""
+    n_a = state["n"][k].copy()
+    n = np.maximum(n_a + n_b, 1)  # both empty: delta * 0 leaves the row at zero
+    delta = mean_b - state["mean"][k]
+    state["mean"][k] += delta * (n_b / n)
+    state["m2"][k] += m2_b + delta * delta * (n_a * n_b / n)
+    state["n"][k] = n_a + n_b
+    state["hist"][k] += hist_b
+
+
+class DriftMonitor:
+    def __init__(self, reference, snapshot_dir=DRIFT_DIR, interval=SNAPSHOT_INTERVAL,
+                 window=DRIFT_WINDOW):
+        self.reference = reference
+        self.keys = reference["keys"]
+        self.edges = np.array(reference["edges"])
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.window = window
+        self.period = window / PERIODS_PER_WINDOW
+        self.started_at = time.time()
+        self.period_start = self.started_at
+        self._state = _empty_state(len(self.keys), self.edges.shape[0])
+        self._lock = threading.Lock()
+        self._last_snapshot = time.monotonic()
+        self._dirty = False
+
+        os.makedirs(snapshot_dir, exist_ok=True)
+        _write_json(os.path.join(snapshot_dir, "reference.json"), reference)
+        atexit.register(self.snapshot)
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(
+            self.snapshot_dir,
+            f"drift-{os.getpid()}-{int(self.started_at)}-{int(self.period_start)}.json"
+        )
+
+    def update(self, X, pred_idx):
+        """Fold readings X (n x sensors) in; pred_idx is the region index or -1."""
+        if time.time() - self.period_start >= self.period:
+            self._roll_over()
+
+        X = np.asarray(X, dtype=float)
+        pred_idx = np.asarray(pred_idx)
+        finite = np.isfinite(X).all(axis=1)
+        X, pred_idx = X[finite], pred_idx[finite]
+        if len(X) == 0:
+            return
+
+        bins = _bins(X, self.edges)
+        groups = [(0, X, bins)]  # key 0 is ALL_KEY; region i is key i + 1
+        for idx in np.unique(pred_idx[pred_idx >= 0]):
+            mask = pred_idx == idx
+            groups.append((int(idx) + 1, X[mask], bins[mask]))
+
+        with self._lock:
+            for k, rows, row_bins in groups:
+                if len(rows) == 1:  # plain Welford step
+                    mean_b, m2_b = rows[0], 0.0
+                else:
+                    mean_b = rows.mean(axis=0)
+                    m2_b = ((rows - mean_b) ** 2).sum(axis=0)
+                hist_b = _count_bins(row_bins, X.shape[1])
+                _merge_into(self._state, k, len(rows), mean_b, m2_b, hist_b)
+            self._dirty = True
+
+        if time.monotonic() - self._last_snapshot >= self.interval:
+            self.snapshot()
+
+    def _take_snapshot(self):
+        # Caller holds the lock
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        return self.snapshot_path, {
+            "keys": self.keys,
+            "started_at": self.started_at,
+            "period_start": self.period_start,
+            "updated_at": time.time(),
+            **{name: arr.tolist() for name, arr in self._state.items()},
+        }
+
+    def snapshot(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            path, payload = self._take_snapshot()
+        _write_json(path, payload)
+
+    def _roll_over(self):
+        """Close the current period's file and start counting from zero."""
+        with self._lock:
+            now = time.time()
+            if now - self.period_start < self.period:
+                return  # another thread already rolled over
+            pending = self._take_snapshot() if self._dirty else None
+            self._state = _empty_state(len(self.keys), self.edges.shape[0])
+            self.period_start = now
+        if pending:
+            _write_json(*pending)
+        prune_snapshots(self.snapshot_dir, self.window)
+
+
+# --------------------------
+# Report (snapshots only)
+# --------------------------
+def load_merged_snapshots(snapshot_dir=DRIFT_DIR, window=DRIFT_WINDOW):
+    with open(os.path.join(snapshot_dir, "reference.json"), "r", encoding="utf-8") as f:
+        reference = json.load(f)
+
+    keys = reference["keys"]
+    merged = _empty_state(len(keys), len(reference["sensors"]))
+    updated_at = None
+    periods = 0
+
+    for path in prune_snapshots(snapshot_dir, window):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snap["keys"] != keys:
+            continue  # written against a different model / class table
+        periods += 1
+        updated_at = max(updated_at or 0, snap["updated_at"])
+        for k in range(len(keys)):
+            _merge_into(merged, k, np.array(snap["n"][k]), np.array(snap["mean"][k]),
+                        np.array(snap["m2"][k]), np.array(snap["hist"][k]))
+
+    return reference, merged, updated_at, periods
+
+
+def _psi(live_share, expected_share):
+    live = np.maximum(live_share, _EPS)
+    expected = np.maximum(expected_share, _EPS)
+    return float(np.sum((live - expected) * np.log(live / expected)))
+
+
+def _status(n, psi, shift):
+    if n < MIN_SAMPLES:
+        return "insufficient"
+    if psi >= PSI_DRIFT or abs(shift) >= SHIFT_DRIFT:
+        return "drift"
+    if psi >= PSI_WARN or abs(shift) >= SHIFT_WARN:
+        return "warn"
+    return "ok"
+
+
+def drift_report(snapshot_dir=DRIFT_DIR, window=DRIFT_WINDOW):
+    try:
+        reference, merged, updated_at, periods = load_merged_snapshots(snapshot_dir, window)
+    except FileNotFoundError:
+        return {"available": False, "keys": []}
+
+    order = {"insufficient": 0, "ok": 1, "warn": 2, "drift": 3}
+    report = {
+        "available": True,
+        "window_s": window,
+        "updated_at": updated_at,
+        "periods": periods,  # period files merged, across all workers
+        "keys": [],
+    }
+
+    for k, key in enumerate(reference["keys"]):
+        sensors = []
+        for j, sensor in enumerate(reference["sensors"]):
+            n = float(merged["n"][k][j])
+            psi = _psi(merged["hist"][k][j] / n, np.array(reference["expected"][k][j])) if n else 0.0
+
+            train_std = reference["std"][k][j] or 1.0
+            mean = float(merged["mean"][k][j])
+            shift = (mean - reference["mean"][k][j]) / train_std if n else 0.0
+            std = float(np.sqrt(merged["m2"][k][j] / (n - 1))) if n > 1 else None
+
+            sensors.append({
+                "sensor": sensor,
+                "n": int(n),
+                "mean": round(mean, 3) if n else None,
+                "std": round(std, 3) if std is not None else None,
+                "train_mean": round(reference["mean"][k][j], 3),
+                "train_std": round(reference["std"][k][j], 3),
+                "mean_shift": round(shift, 3),
+                "psi": round(psi, 4),
+                "status": _status(n, psi, shift),
+            })
+
+        report["keys"].append({
+            "key": key,
+            "n": int(merged["n"][k].max()) if len(merged["n"][k]) else 0,
+            "status": max((s["status"] for s in sensors), key=order.get),
+            "max_psi": max(s["psi"] for s in sensors),
+            "sensors": sensors,
+        })
+
+    return report
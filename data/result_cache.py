@@ -0,0 +1,72 @@
+"""On-disk, content-addressed cache for /predict-batch responses.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus everything
+else that can change the answer (model version, thresholds), so a repeat
+upload of the same CSV returns the stored result set without parsing or
+running the model again. Files are JSON; their mtime doubles as the LRU
+clock, which keeps the cache consistent across gunicorn workers.
+"""
+import hashlib
+import json
+import os
+
+from data.db import DATA_DIR
+
+CACHE_DIR = os.environ.get("BATCH_CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+CACHE_MAX_BYTES = int(os.environ.get("BATCH_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def cache_key(content, *parts):
+    h = hashlib.sha256(content)
+    for part in parts:
+        h.update(b"\0")
+        h.update(str(part).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def get_cached_result(key, cache_dir=CACHE_DIR):
+    path = _entry_path(key, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        os.utime(path)  # mark as recently used
+        return result
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def store_result(key, result, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _entry_path(key, cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, path)
+
+    evict(cache_dir, max_bytes)
+
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # another worker got there first
+        total -= size
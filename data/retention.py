@@ -0,0 +1,320 @@
+"""Retention for the prediction log.
+
+Rows older than RETENTION_DAYS are copied into gzip CSV partitions
+(one file per table per day) under ARCHIVE_DIR, then deleted from the
+live tables in small batches. Their counts are folded into
+`archived_region_statistics` in the same transaction as the delete, so
+`get_region_statistics()` reports the same numbers before and after.
+Works on the sqlite prediction store only (PREDICTION_STORE=sqlite...).
+
+    python -m data.retention archive --days 90
+    python -m data.retention archive --days 90 --every 3600   # scheduled
+    python -m data.retention query user_predictions --start 2026-01-01
+    python -m data.retention restore batch_predictions --start 2026-01-26 --end 2026-01-31
+"""
+import argparse
+import csv
+import gzip
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from data import db
+from data.backends.sqlite import NULL_REGION
+
+# The only copy of pruned rows: keep it with the database, not in the checkout
+ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", os.path.join(db.DATA_DIR, "archive"))
+RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", 90))
+BATCH_SIZE = 500           # rows deleted per transaction
+BATCH_PAUSE = 0.05         # seconds between batches, lets writers in
+VACUUM_PAGES = 1000        # pages released per incremental_vacuum step
+
+TABLE_COLUMNS = {
+    "user_predictions": [
+        "id", "input_data", "predicted_region", "confidence", "status", "created_at"
+    ],
+    "batch_predictions": [
+        "id", "filename", "row_data", "predicted_region", "confidence", "status", "created_at"
+    ],
+}
+
+
+# --------------------------
+# Archive file helpers
+# --------------------------
+def partition_path(table, day, archive_dir=ARCHIVE_DIR):
+    return os.path.join(archive_dir, table, f"{day}.csv.gz")
+
+
+def list_partitions(table, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    folder = os.path.join(archive_dir, table)
+    if not os.path.isdir(folder):
+        return []
+
+    days = sorted(
+        name[:-len(".csv.gz")] for name in os.listdir(folder) if name.endswith(".csv.gz")
+    )
+    return [
+        day for day in days
+        if (start is None or day >= start) and (end is None or day <= end)
+    ]
+
+
+def _append_partition(table, day, rows, archive_dir):
+    path = partition_path(table, day, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    is_new = not os.path.exists(path)
+
+    # Each call appends a new gzip member; gzip readers concatenate them.
+    with gzip.open(path, "at", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if is_new:
+            writer.writerow(TABLE_COLUMNS[table])
+        for row in rows:
+            writer.writerow(["" if row[col] is None else row[col] for col in TABLE_COLUMNS[table]])
+
+
+def _parse_archived_row(record):
+    row = {key: (value if value != "" else None) for key, value in record.items()}
+    row["id"] = int(row["id"])
+    if row["confidence"] is not None:
+        row["confidence"] = float(row["confidence"])
+    return row
+
+
+def iter_archived_rows(table, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    """Yield archived rows as dicts for days in [start, end] (YYYY-MM-DD)."""
+    for day in list_partitions(table, start, end, archive_dir):
+        # A crash between writing a batch and deleting it can archive a row twice.
+        seen = set()
+        with gzip.open(partition_path(table, day, archive_dir), "rt", newline="", encoding="utf-8") as f:
+            for record in csv.DictReader(f):
+                row = _parse_archived_row(record)
+                if row["id"] in seen:
+                    continue
+                seen.add(row["id"])
+                yield row
+
+
+# --------------------------
+# Rollup of archived rows
+# --------------------------
+def _summarize(rows):
+    totals = defaultdict(lambda: [0, 0, 0.0, 0])
+    for row in rows:
+        t = totals[row["predicted_region"]]
+        t[0] += 1
+        t[1] += 1 if row["status"] == "ACCEPTED" else 0
+        if row["confidence"] is not None:
+            t[2] += row["confidence"]
+            t[3] += 1
+    return totals
+
+
+def _apply_rollup(cursor, totals, sign=1):
+    for region, (total, accepted, conf_sum, conf_count) in totals.items():
+        region = NULL_REGION if region is None else region
+        cursor.execute("""
+            INSERT INTO archived_region_statistics
+            (predicted_region, total, accepted, confidence_sum, confidence_count)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(predicted_region) DO UPDATE SET
+                total = total + excluded.total,
+                accepted = accepted + excluded.accepted,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_count = confidence_count + excluded.confidence_count
+        """, (region, sign * total, sign * accepted, sign * conf_sum, sign * conf_count))
+
+
+# --------------------------
+# Archive + prune
+# --------------------------
+def _cutoff(max_age_days):
+    cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+    return cutoff.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def archive_table(table, cutoff, archive_dir=ARCHIVE_DIR, batch_size=BATCH_SIZE, pause=BATCH_PAUSE):
+    columns = ", ".join(TABLE_COLUMNS[table])
+    moved = 0
+
+    while True:
+        conn = db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {columns} FROM {table} WHERE created_at < ? ORDER BY id LIMIT ?",
+                (cutoff, batch_size)
+            )
+            rows = [dict(r) for r in cursor.fetchall()]
+            if not rows:
+                break
+
+            # Write the archive first: a crash afterwards leaves the rows live
+            # (and archived twice), never lost.
+            by_day = defaultdict(list)
+            for row in rows:
+                by_day[row["created_at"][:10]].append(row)
+            for day, day_rows in by_day.items():
+                _append_partition(table, day, day_rows, archive_dir)
+
+            cursor.executemany(f"DELETE FROM {table} WHERE id = ?", [(r["id"],) for r in rows])
+            _apply_rollup(cursor, _summarize(rows))
+            conn.commit()
+        finally:
+            conn.close()
+
+        moved += len(rows)
+        if len(rows) < batch_size:
+            break
+        time.sleep(pause)
+
+    return moved
+
+
+def archive_old_predictions(max_age_days=RETENTION_DAYS, archive_dir=ARCHIVE_DIR,
+                            batch_size=BATCH_SIZE, pause=BATCH_PAUSE, vacuum=True):
+    db.init_db()  # older databases lack archived_region_statistics
+    cutoff = _cutoff(max_age_days)
+    moved = {
+        table: archive_table(table, cutoff, archive_dir, batch_size, pause)
+        for table in TABLE_COLUMNS
+    }
+    if vacuum and any(moved.values()):
+        moved["pages_freed"] = incremental_vacuum(pause=pause)
+    return moved
+
+
+# --------------------------
+# Restore
+# --------------------------
+def restore_partitions(table, start=None, end=None, archive_dir=ARCHIVE_DIR):
+    """Move whole day partitions back into the live table and drop the files."""
+    db.init_db()
+    columns = TABLE_COLUMNS[table]
+    placeholders = ", ".join("?" for _ in columns)
+    restored = 0
+
+    for day in list_partitions(table, start, end, archive_dir):
+        conn = db.get_connection()
+        try:
+            cursor = conn.cursor()
+            inserted = []
+            for row in iter_archived_rows(table, day, day, archive_dir):
+                cursor.execute(
+                    f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                    [row[col] for col in columns]
+                )
+                if cursor.rowcount == 1:
+                    inserted.append(row)
+            _apply_rollup(cursor, _summarize(inserted), sign=-1)
+            cursor.execute("DELETE FROM archived_region_statistics WHERE total <= 0")
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.remove(partition_path(table, day, archive_dir))
+        restored += len(inserted)
+
+    return restored
+
+
+# --------------------------
+# Vacuum
+# --------------------------
+def incremental_vacuum(pages=VACUUM_PAGES, pause=BATCH_PAUSE):
+    conn = db.get_connection()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("[WARN] auto_vacuum is not INCREMENTAL; run `enable-vacuum` once to reclaim space")
+            return 0
+
+        freed = 0
+        while True:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free == 0:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            freed += min(free, pages)
+            time.sleep(pause)
+        return freed
+    finally:
+        conn.close()
+
+
+def enable_incremental_vacuum():
+    # Changing auto_vacuum on an existing file needs one full VACUUM,
+    # which locks the database; run it during a quiet period.
+    conn = db.get_connection()
+    try:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+# --------------------------
+# CLI
+# --------------------------
+def run_scheduled(every_seconds, **kwargs):
+    while True:
+        try:
+            moved = archive_old_predictions(**kwargs)
+            print(f"[INFO] Retention pass: {moved}")
+        except Exception as e:
+            print(f"[ERROR] Retention pass failed: {e}")
+        time.sleep(every_seconds)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive, query and restore old prediction rows.")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_archive = sub.add_parser("archive", help="move rows older than --days into the archive")
+    p_archive.add_argument("--days", type=int, default=RETENTION_DAYS)
+    p_archive.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    p_archive.add_argument("--no-vacuum", action="store_true")
+    p_archive.add_argument("--every", type=int, metavar="SECONDS",
+                           help="keep running, one pass every SECONDS")
+
+    for name, help_text in (("query", "print archived rows as CSV"),
+                            ("restore", "move archived day partitions back into the live table")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("table", choices=sorted(TABLE_COLUMNS))
+        p.add_argument("--start", help="first day, YYYY-MM-DD")
+        p.add_argument("--end", help="last day, YYYY-MM-DD")
+
+    sub.add_parser("vacuum", help="release free pages (incremental)")
+    sub.add_parser("enable-vacuum", help="switch an existing database to incremental auto_vacuum")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "archive":
+        kwargs = dict(max_age_days=args.days, archive_dir=args.archive_dir,
+                      batch_size=args.batch_size, vacuum=not args.no_vacuum)
+        if args.every:
+            run_scheduled(args.every, **kwargs)
+        print(archive_old_predictions(**kwargs))
+
+    elif args.command == "query":
+        writer = csv.DictWriter(sys.stdout, fieldnames=TABLE_COLUMNS[args.table])
+        writer.writeheader()
+        for row in iter_archived_rows(args.table, args.start, args.end, args.archive_dir):
+            writer.writerow(row)
+
+    elif args.command == "restore":
+        print(f"Restored {restore_partitions(args.table, args.start, args.end, args.archive_dir)} rows")
+
+    elif args.command == "vacuum":
+        print(f"Freed {incremental_vacuum()} pages")
+
+    elif args.command == "enable-vacuum":
+        enable_incremental_vacuum()
+        print("auto_vacuum set to INCREMENTAL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""Region decision logic shared by app.py and the offline tools.
+
+A reading is ACCEPTED only if it passes, in order:
+  1. the global OOD check (every sensor within the training range +- TOLERANCE),
+  2. the confidence check (top class probability >= CONFIDENCE_THRESHOLD),
+  3. the region envelope check (every sensor within the predicted region's
+     training range +- TOLERANCE).
+Everything here works on 2-D arrays so one call scores a whole batch.
+
+With early_exit=True the trees are evaluated one at a time, in model
+order, and a reading stops as soon as the remaining trees can no longer
+change its outcome. Each tree adds a distribution summing to 1, so after
+k of T trees class c ends between S_c / T and (S_c + T - k) / T. A reading
+is decided once either
+  - its top class leads every other class by more than T - k votes and
+    is already at CONFIDENCE_THRESHOLD, or
+  - no class can still reach CONFIDENCE_THRESHOLD.
+Then the status and region match the full ensemble. Probabilities are
+S / k over the trees seen and are flagged as partial.
+"""
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import LabelEncoder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, "tea_models_project", "ExtraTrees_model.pkl")
+DATA_PATH = os.path.join(BASE_DIR, "tea_models_project", "tea_aroma_balanced.csv")
+
+TOLERANCE = 5.0
+CONFIDENCE_THRESHOLD = 0.55
+
+# Bounds must clear by this much (in votes) so rounding can't flip a decision
+_EXIT_MARGIN = 1e-9
+
+OOD_GLOBAL = "OOD_GLOBAL"
+LOW_CONFIDENCE = "LOW_CONFIDENCE"
+REGION_MISMATCH = "REGION_MISMATCH"
+
+
+# --------------------------
+# LOADING
+# --------------------------
+def load_model(path=MODEL_PATH):
+    with open(path, "rb") as f:
+        model_bytes = f.read()
+    model = pickle.loads(model_bytes)
+    return model, hashlib.sha256(model_bytes).hexdigest()[:16]
+
+
+def build_reference(data):
+    """Encoder and sensor envelopes from a training frame (sensors..., region)."""
+    X = data.iloc[:, :-1]
+    y = data.iloc[:, -1]
+
+    encoder = LabelEncoder()
+    encoder.fit(y)
+
+    region_min = np.array([X[y == r].min().values for r in encoder.classes_], dtype=float)
+    region_max = np.array([X[y == r].max().values for r in encoder.classes_], dtype=float)
+
+    return {
+        "encoder": encoder,
+        "sensor_columns": X.columns.tolist(),
+        "global_min": X.min().values.astype(float),
+        "global_max": X.max().values.astype(float),
+        "region_min": region_min,
+        "region_max": region_max,
+    }
+
+
+def load_reference(path=DATA_PATH):
+    return build_reference(pd.read_csv(path))
+
+
+# A retrained model (tools/retrain.py) ships its envelopes as <model>.json
+def envelope_path(model_path):
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+def save_envelope(path, reference, **extra):
+    envelope = {
+        "classes": reference["encoder"].classes_.tolist(),
+        "sensor_columns": reference["sensor_columns"],
+        **{key: reference[key].tolist() for key in ("global_min", "global_max", "region_min", "region_max")},
+        **extra,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(envelope, f, indent=2)
+
+
+def load_envelope(model_path):
+    """Reference saved next to model_path, or None if there isn't one."""
+    path = envelope_path(model_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        envelope = json.load(f)
+
+    encoder = LabelEncoder()
+    encoder.classes_ = np.array(envelope["classes"], dtype=object)
+    return {
+        "encoder": encoder,
+        "sensor_columns": envelope["sensor_columns"],
+        **{key: np.array(envelope[key], dtype=float)
+           for key in ("global_min", "global_max", "region_min", "region_max")},
+    }
+
+
+def model_reference(model_path=MODEL_PATH, data_path=DATA_PATH, data=None):
+    """Reference to score model_path with: its saved envelopes, else the training CSV.
+
+    data, if given, is the already-loaded CSV.
+    """
+    reference = load_envelope(model_path)
+    if reference is None:
+        reference = build_reference(pd.read_csv(data_path) if data is None else data)
+    return reference
+
+
+# --------------------------
+# EARLY EXIT
+# --------------------------
+def cascade_proba(model, X, threshold=CONFIDENCE_THRESHOLD):
+    """Soft-vote probabilities that stop per row once the outcome is fixed.
+
+    Returns (probabilities, trees_evaluated). Rows that ran every tree get
+    exactly what model.predict_proba() returns.
+    """
+    estimators = model.estimators_
+    n_trees = len(estimators)
+    X = np.ascontiguousarray(X, dtype=np.float32)  # as the forest passes it to its trees
+
+    n_classes = model.n_classes_
+    totals = np.zeros((X.shape[0], n_classes))
+    evaluated = np.zeros(X.shape[0], dtype=np.int64)
+    active = np.arange(X.shape[0])
+    X_active = X
+    needed = threshold * n_trees
+
+    # Neither exit is reachable before this tree, so skip the checks until then:
+    # accepting needs a majority and `needed` votes, rejecting needs the top
+    # class (at least k / n_classes votes) to stay below `needed`.
+    first_check = min(
+        max(np.ceil(needed), n_trees // 2 + 1),
+        (n_trees - needed) // (1 - 1 / n_classes) + 1,
+    ) - 1
+
+    for k, est in enumerate(estimators, start=1):
+        proba = est.tree_.predict(X_active)
+        normalizer = proba.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        totals[active] += proba / normalizer
+        if k < first_check:
+            continue
+        evaluated[active] = k
+
+        remaining = n_trees - k
+        second, first = np.partition(totals[active], -2, axis=1)[:, -2:].T
+        accepted = (first - second > remaining + _EXIT_MARGIN) & (first >= needed + _EXIT_MARGIN)
+        rejected = first + remaining < needed - _EXIT_MARGIN
+        running = ~(accepted | rejected)
+        if not running.all():
+            active, X_active = active[running], X_active[running]
+            if active.size == 0:
+                break
+
+    evaluated[active] = n_trees
+    return totals / evaluated[:, None], evaluated
+
+
+# --------------------------
+# DECISION
+# --------------------------
+def classify(model, reference, X, tolerance=TOLERANCE, threshold=CONFIDENCE_THRESHOLD,
+             early_exit=False):
+    """Score readings X (n x 7) and apply the three checks.
+
+    Returns arrays of length n: "reason" (None when accepted),
+    "pred_idx" (-1 where the model was not run), "confidence",
+    "probabilities" (NaN where the model was not run), "trees_evaluated"
+    and "partial" (True where early_exit stopped before the last tree).
+    """
+    X = np.asarray(X, dtype=float)
+    n = X.shape[0]
+
+    # Non-finite readings can't be scored and are treated as out of range
+    in_range = np.isfinite(X).all(axis=1) & ~(
+        (X < reference["global_min"] - tolerance) | (X > reference["global_max"] + tolerance)
+    ).any(axis=1)
+
+    n_classes = len(reference["encoder"].classes_)
+    reason = np.full(n, None, dtype=object)
+    reason[~in_range] = OOD_GLOBAL
+    pred_idx = np.full(n, -1, dtype=np.int64)
+    confidence = np.full(n, np.nan)
+    probabilities = np.full((n, n_classes), np.nan)
+    trees_evaluated = np.zeros(n, dtype=np.int64)
+
+    rows = np.flatnonzero(in_range)
+    if rows.size:
+        if early_exit:
+            proba, trees_evaluated[rows] = cascade_proba(model, X[rows], threshold)
+        else:
+            proba = model.predict_proba(X[rows])
+            trees_evaluated[rows] = len(model.estimators_)
+        top = proba.argmax(axis=1)
+        idx = model.classes_[top].astype(np.int64)
+        conf = proba[np.arange(rows.size), top]
+
+        pred_idx[rows] = idx
+        confidence[rows] = conf
+        probabilities[rows] = proba
+
+        low = conf < threshold
+        reason[rows[low]] = LOW_CONFIDENCE
+
+        outside = (
+            (X[rows] < reference["region_min"][idx] - tolerance)
+            | (X[rows] > reference["region_max"][idx] + tolerance)
+        ).any(axis=1)
+        reason[rows[~low & outside]] = REGION_MISMATCH
+
+    return {
+        "reason": reason,
+        "pred_idx": pred_idx,
+        "confidence": confidence,
+        "probabilities": probabilities,
+        "trees_evaluated": trees_evaluated,
+        "partial": (trees_evaluated > 0) & (trees_evaluated < len(model.estimators_)),
+    }
@@ -0,0 +1,70 @@
+"""tracemalloc helpers: named snapshots and the diff between two of them.
+
+Snapshots live in this worker's memory only. Each gunicorn worker has its
+own set, and every response names the pid it came from. Memory malloc'd
+directly by C extensions, such as sklearn's tree node arrays, is not
+traced. Compare max RSS for those.
+"""
+import os
+import tracemalloc
+
+TRACE_FRAMES = int(os.environ.get("PROFILING_TRACEMALLOC_FRAMES", 10))
+
+snapshots = {}
+
+# Allocations made by tracemalloc itself and by the import machinery are noise here
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def start_tracing(frames=TRACE_FRAMES):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracing():
+    tracemalloc.stop()
+    snapshots.clear()
+
+
+def take_snapshot(name):
+    """Store a snapshot under name; a no-op (None) while tracing is off."""
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot().filter_traces(_NOISE)
+    snapshots[name] = snapshot
+    return snapshot
+
+
+def status():
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "pid": os.getpid(),
+        "tracing": tracemalloc.is_tracing(),
+        "frames": tracemalloc.get_traceback_limit(),
+        "traced_mb": round(current / 1e6, 3),
+        "peak_mb": round(peak / 1e6, 3),
+        "snapshots": list(snapshots),
+    }
+
+
+def diff(before, after, key_type="lineno", limit=20):
+    """Largest allocation changes from snapshot `before` to `after`."""
+    rows = []
+    for stat in after.compare_to(before, key_type)[:limit]:
+        frame = stat.traceback[0]
+        row = {
+            "location": f"{frame.filename}:{frame.lineno}",
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "size_kb": round(stat.size / 1024, 1),
+            "count_diff": stat.count_diff,
+            "count": stat.count,
+        }
+        if key_type == "traceback":
+            row["traceback"] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+        rows.append(row)
+    return rows
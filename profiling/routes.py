@@ -0,0 +1,247 @@
+# profiling/routes.py
+"""On-demand profiling for live workers.
+
+app.py registers this blueprint only when PROFILING_TOKEN is set. Every
+request needs the header `X-Profile-Token: <token>`. The capture
+middleware never records that header.
+
+Per-request cProfile, on /predict and /predict-batch:
+    add `X-Profile: 1` or `?cprofile=1` (optional cprofile_sort=cumulative|tottime|ncalls,
+    cprofile_top=30). The reply wraps the normal one:
+    {"status_code", "response", "profile": {"wall_ms", "functions": [...], "file"}}
+    and the full .prof file is kept in PROFILING_DIR (GET /debug/profile/requests/<file>).
+
+Sampling profile of the whole worker (collapsed stacks for flamegraphs):
+    POST /debug/profile/sample?seconds=10&interval_ms=5   -> 202 {"file": ...}
+    GET  /debug/profile/sample/<file>                      (404 until done)
+    GET  /debug/profile/samples
+
+tracemalloc (PROFILING_TRACEMALLOC=1 traces from startup and keeps the
+snapshots before_model, after_model and after_data):
+    POST /debug/profile/tracemalloc/start?frames=10
+    POST /debug/profile/tracemalloc/snapshot?name=<name>
+    GET  /debug/profile/tracemalloc/diff?from=<name>&to=<name>&group=lineno&top=20
+         (`to` defaults to a fresh snapshot)
+    GET  /debug/profile/tracemalloc
+    POST /debug/profile/tracemalloc/stop
+
+Each gunicorn worker profiles only itself, and every reply carries its pid.
+Sample files are on disk, so any worker can serve them.
+"""
+import cProfile
+import hmac
+import os
+import pstats
+import sys
+import threading
+import time
+
+from flask import Blueprint, g, jsonify, request, send_from_directory
+
+from data.db import DATA_DIR
+from . import memory
+from .sampler import SamplingJob
+
+PROFILING_TOKEN = os.environ.get("PROFILING_TOKEN", "")
+PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILED_ENDPOINTS = {"predict", "predict_batch"}
+SORT_KEYS = {"cumulative": 3, "tottime": 2, "ncalls": 1}   # index into pstats rows
+MAX_SAMPLE_SECONDS = 120
+
+profiling_bp = Blueprint("profiling", __name__, url_prefix="/debug/profile")
+
+sampling_job = SamplingJob(PROFILING_DIR)
+# Only one cProfile at a time: newer Pythons allow a single active profiler
+_request_profile_lock = threading.Lock()
+
+
+def _authorized():
+    token = request.headers.get("X-Profile-Token", "")
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(token, PROFILING_TOKEN)
+
+
+@profiling_bp.before_request
+def require_token():
+    if not _authorized():
+        return jsonify({"success": False, "error": "Profiling token required"}), 401
+
+
+# --------------------------
+# Per-request cProfile
+# --------------------------
+def _short_path(path):
+    for prefix in sorted({os.getcwd(), sys.prefix, sys.base_prefix}, key=len, reverse=True):
+        if path.startswith(prefix + os.sep):
+            return os.path.relpath(path, prefix)
+    return path
+
+
+def _top_functions(profiler, sort, limit):
+    stats = pstats.Stats(profiler).stats
+    rows = [
+        (f"{_short_path(file)}:{line}({func})", nc, tt, ct)
+        for (file, line, func), (cc, nc, tt, ct, callers) in stats.items()
+    ]
+    rows.sort(key=lambda r: r[SORT_KEYS[sort]], reverse=True)
+    return [
+        {"function": name, "ncalls": nc, "tottime_ms": round(tt * 1000, 3), "cumtime_ms": round(ct * 1000, 3)}
+        for name, nc, tt, ct in rows[:limit]
+    ]
+
+
+@profiling_bp.before_app_request
+def start_request_profile():
+    if request.endpoint not in PROFILED_ENDPOINTS:
+        return None
+    if request.headers.get("X-Profile") != "1" and request.args.get("cprofile") != "1":
+        return None
+    if not _authorized():
+        return jsonify({"success": False, "error": "Profiling token required"}), 401
+    if not _request_profile_lock.acquire(blocking=False):
+        g.profile_busy = True
+        return None
+
+    g.profiler = cProfile.Profile()
+    g.profile_started = time.perf_counter()
+    g.profiler.enable()
+    return None
+
+
+@profiling_bp.after_app_request
+def finish_request_profile(response):
+    if g.pop("profile_busy", False):
+        response.headers["X-Profile-Status"] = "busy"
+        return response
+
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    wall_ms = (time.perf_counter() - g.pop("profile_started")) * 1000
+    _request_profile_lock.release()
+
+    sort = request.args.get("cprofile_sort", "cumulative")
+    sort = sort if sort in SORT_KEYS else "cumulative"
+    limit = request.args.get("cprofile_top", 30, type=int)
+
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    name = f"request-{request.endpoint}-{os.getpid()}-{int(time.time() * 1000)}.prof"
+    profiler.dump_stats(os.path.join(PROFILING_DIR, name))
+
+    wrapped = jsonify({
+        "status_code": response.status_code,
+        "response": response.get_json(silent=True),
+        "profile": {
+            "pid": os.getpid(),
+            "wall_ms": round(wall_ms, 3),
+            "sort": sort,
+            "functions": _top_functions(profiler, sort, limit),
+            "file": name,
+        },
+    })
+    wrapped.status_code = response.status_code
+    if "X-Cache" in response.headers:
+        wrapped.headers["X-Cache"] = response.headers["X-Cache"]
+    return wrapped
+
+
+@profiling_bp.teardown_app_request
+def release_request_profile(exc):
+    # Only reached with a profiler still attached when the view raised
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _request_profile_lock.release()
+
+
+@profiling_bp.route("/requests/<path:name>")
+def request_profile_file(name):
+    return send_from_directory(PROFILING_DIR, name, mimetype="application/octet-stream")
+
+
+# --------------------------
+# Sampling profiler
+# --------------------------
+@profiling_bp.route("/sample", methods=["POST"])
+def start_sample():
+    seconds = request.args.get("seconds", 10, type=float)
+    interval_ms = request.args.get("interval_ms", 5, type=float)
+    if not 0 < seconds <= MAX_SAMPLE_SECONDS or not 1 <= interval_ms <= 1000:
+        return jsonify({
+            "success": False,
+            "error": f"seconds must be in (0, {MAX_SAMPLE_SECONDS}] and interval_ms in [1, 1000]"
+        }), 400
+
+    name = sampling_job.start(seconds, interval_ms / 1000)
+    if name is None:
+        return jsonify({"success": False, "error": "A sampling profile is already running"}), 409
+    return jsonify({"success": True, "pid": os.getpid(), "file": name, "ready_in_s": seconds}), 202
+
+
+@profiling_bp.route("/sample/<path:name>")
+def sample_file(name):
+    return send_from_directory(PROFILING_DIR, name, mimetype="text/plain")
+
+
+@profiling_bp.route("/samples")
+def list_samples():
+    files = sorted(os.listdir(PROFILING_DIR)) if os.path.isdir(PROFILING_DIR) else []
+    return jsonify({
+        "samples": [f for f in files if f.endswith(".folded")],
+        "requests": [f for f in files if f.endswith(".prof")],
+        "running": sampling_job.running,
+    })
+
+
+# --------------------------
+# tracemalloc
+# --------------------------
+@profiling_bp.route("/tracemalloc")
+def tracemalloc_status():
+    return jsonify(memory.status())
+
+
+@profiling_bp.route("/tracemalloc/start", methods=["POST"])
+def tracemalloc_start():
+    memory.start_tracing(request.args.get("frames", memory.TRACE_FRAMES, type=int))
+    memory.take_snapshot("start")
+    return jsonify(memory.status())
+
+
+@profiling_bp.route("/tracemalloc/snapshot", methods=["POST"])
+def tracemalloc_snapshot():
+    name = request.args.get("name") or time.strftime("%H%M%S")
+    if memory.take_snapshot(name) is None:
+        return jsonify({"success": False, "error": "tracemalloc is not running"}), 409
+    return jsonify(memory.status())
+
+
+@profiling_bp.route("/tracemalloc/diff")
+def tracemalloc_diff():
+    group = request.args.get("group", "lineno")
+    if group not in ("lineno", "filename", "traceback"):
+        return jsonify({"success": False, "error": "group must be lineno, filename or traceback"}), 400
+
+    before_name = request.args.get("from", "start")
+    after_name = request.args.get("to")
+    before = memory.snapshots.get(before_name)
+    after = memory.snapshots.get(after_name) if after_name else memory.take_snapshot("now")
+    if before is None or after is None:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown snapshot or tracemalloc not running; have {list(memory.snapshots)}"
+        }), 404
+
+    return jsonify({
+        "pid": os.getpid(),
+        "from": before_name,
+        "to": after_name or "now",
+        "group": group,
+        "stats": memory.diff(before, after, group, request.args.get("top", 20, type=int)),
+    })
+
+
+@profiling_bp.route("/tracemalloc/stop", methods=["POST"])
+def tracemalloc_stop():
+    memory.stop_tracing()
+    return jsonify(memory.status())
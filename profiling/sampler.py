@@ -0,0 +1,84 @@
+"""Wall-clock sampling profiler writing collapsed stacks.
+
+Every `interval` seconds the stacks of all other threads are recorded as
+one line per distinct stack, which is the format flamegraph.pl, speedscope
+and inferno read:
+
+    <thread>;<file>:<function>;<file>:<function>... <count>
+
+It runs in its own thread and adds no cost when stopped.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    name = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{name}:{code.co_name}".replace(";", ":")
+
+
+def collapse(frame):
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+def sample(seconds, interval=0.005):
+    """Counter of collapsed stacks over `seconds` of wall time."""
+    own = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name.replace(" ", "_") for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                counts[f"{names.get(ident, ident)};{collapse(frame)}"] += 1
+        time.sleep(interval)
+    return counts
+
+
+def write_collapsed(path, counts):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for stack, count in counts.most_common():
+            f.write(f"{stack} {count}\n")
+    os.replace(tmp_path, path)  # readers never see a partial file
+
+
+class SamplingJob:
+    """At most one sampling run per worker, writing to out_dir when done."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, interval):
+        with self._lock:
+            if self.running:
+                return None
+            os.makedirs(self.out_dir, exist_ok=True)
+            name = f"sample-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+            self._thread = threading.Thread(
+                target=self._run, args=(os.path.join(self.out_dir, name), seconds, interval),
+                name="profiling-sampler", daemon=True
+            )
+            self._thread.start()
+            return name
+
+    def _run(self, path, seconds, interval):
+        try:
+            write_collapsed(path, sample(seconds, interval))
+        except Exception as e:
+            print(f"[WARN] Sampling profile failed: {e}")
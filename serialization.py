@@ -0,0 +1,170 @@
+"""JSON encoding and response profiles for the prediction routes.
+
+FastJSONProvider replaces Flask's stdlib provider. It uses orjson when it
+is installed, which encodes numpy scalars and arrays natively, and falls
+back to json.dumps with a numpy-aware `default` otherwise.
+
+Response profiles (chosen per request with ?profile=...):
+  full     the original payload, unchanged (default)
+  compact  no echoed sensors, floats rounded to `precision` digits,
+           top-k probabilities as [class_index, p] pairs (top_k=0 drops
+           them), the class table sent once, and batch results as columns
+           instead of one object per row. explain=true explanations are
+           kept, rounded and keyed by class index.
+"""
+import json
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib fallback below
+    orjson = None
+
+PROFILES = ("full", "compact")
+DEFAULT_TOP_K = 3
+DEFAULT_PRECISION = 4
+
+
+# --------------------------
+# JSON provider
+# --------------------------
+def _default(o):
+    if isinstance(o, np.generic):
+        return o.item()
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    def _orjson_options(self, sort_keys):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps(self, obj, **kwargs):
+        sort_keys = kwargs.pop("sort_keys", self.sort_keys)
+        if orjson is None or kwargs.get("indent"):
+            kwargs.setdefault("default", _default)
+            kwargs.setdefault("ensure_ascii", self.ensure_ascii)
+            return json.dumps(obj, sort_keys=sort_keys, **kwargs)
+        return orjson.dumps(obj, default=_default, option=self._orjson_options(sort_keys)).decode()
+
+    def response(self, *args, **kwargs):
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        if orjson is None or pretty:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(
+            obj, default=_default,
+            option=self._orjson_options(self.sort_keys) | orjson.OPT_APPEND_NEWLINE
+        )
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# --------------------------
+# Profiles
+# --------------------------
+def parse_profile(args):
+    """(profile, top_k, precision) from request args / form; raises ValueError."""
+    profile = args.get("profile", "full")
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}', expected one of {', '.join(PROFILES)}")
+    top_k = int(args.get("top_k", DEFAULT_TOP_K))
+    precision = int(args.get("precision", DEFAULT_PRECISION))
+    if top_k < 0 or not 0 <= precision <= 15:
+        raise ValueError("top_k must be >= 0 and precision between 0 and 15")
+    return profile, top_k, precision
+
+
+def _round(value, precision):
+    return None if value is None else round(float(value), precision)
+
+
+def _top_k(rows, classes, top_k, precision):
+    """[[class_index, p], ...] for each probabilities dict in rows, best first."""
+    # Every dict is built from the same class table, so one key order fits all
+    class_index = {name: i for i, name in enumerate(classes)}
+    column_class = np.array([class_index[name] for name in rows[0]])
+
+    P = np.array([list(probabilities.values()) for probabilities in rows], dtype=float)
+    order = np.argsort(-P, axis=1, kind="stable")[:, :top_k]
+    top = np.round(np.take_along_axis(P, order, axis=1), precision)
+    return [
+        [list(pair) for pair in zip(idx, p)]
+        for idx, p in zip(column_class[order].tolist(), top.tolist())
+    ]
+
+
+def _compact_explanation(explanation, class_index, precision):
+    return {
+        "class": class_index[explanation["region"]],
+        "bias": _round(explanation["bias"], precision),
+        "contributions": {
+            sensor: _round(value, precision) for sensor, value in explanation["contributions"].items()
+        },
+    }
+
+
+def compact_prediction(payload, classes, top_k=DEFAULT_TOP_K, precision=DEFAULT_PRECISION):
+    class_index = {name: i for i, name in enumerate(classes)}
+    compact = {
+        "success": payload["success"],
+        "model": payload["model"],
+        "classes": list(classes),
+        "class": class_index[payload["prediction"]],
+        "prediction": payload["prediction"],
+        "confidence": _round(payload["confidence"], precision),
+    }
+    if "partial" in payload:
+        compact["partial"] = payload["partial"]
+        compact["trees_evaluated"] = payload["trees_evaluated"]
+    if top_k:
+        compact["top_k"] = _top_k([payload["probabilities"]], classes, top_k, precision)[0]
+    if "explanation" in payload:
+        compact["explanation"] = _compact_explanation(payload["explanation"], class_index, precision)
+    return compact
+
+
+def compact_batch(payload, classes, top_k=DEFAULT_TOP_K, precision=DEFAULT_PRECISION):
+    class_index = {name: i for i, name in enumerate(classes)}
+    results = payload["results"]
+
+    regions = [r.get("prediction", r.get("predicted_region")) for r in results]
+    columns = {
+        "sample_index": [r["sample_index"] for r in results],
+        "accepted": [r["status"] == "ACCEPTED" for r in results],
+        "reason": [r.get("reason") for r in results],
+        "class": [class_index[name] if name is not None else None for name in regions],
+        "confidence": [_round(r.get("confidence"), precision) for r in results],
+    }
+    if any("partial" in r for r in results):
+        columns["partial"] = [r.get("partial") for r in results]
+        columns["trees_evaluated"] = [r.get("trees_evaluated") for r in results]
+    if top_k:
+        # Only accepted rows carry probabilities
+        scored = [i for i, r in enumerate(results) if "probabilities" in r]
+        columns["top_k"] = [None] * len(results)
+        if scored:
+            ranked = _top_k([results[i]["probabilities"] for i in scored], classes, top_k, precision)
+            for i, pairs in zip(scored, ranked):
+                columns["top_k"][i] = pairs
+    if any("explanation" in r for r in results):
+        columns["explanation"] = [
+            _compact_explanation(r["explanation"], class_index, precision) if "explanation" in r else None
+            for r in results
+        ]
+
+    return {
+        "success": payload["success"],
+        "model": payload["model"],
+        "total_samples": payload["total_samples"],
+        "accepted": payload["accepted"],
+        "rejected": payload["rejected"],
+        "classes": list(classes),
+        "columns": columns,
+    }
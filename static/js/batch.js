@@ -99,6 +99,7 @@ async function submitBatch() {
     }
 
     console.log("Batch response:", result);
+    result.cached = response.headers.get("X-Cache") === "HIT";
     renderBatchResults(result);
 
     analyzeBtn.style.display = "none";
@@ -132,7 +133,7 @@ function renderBatchResults(response) {
     Total Samples: ${response.total_samples} |
     Accepted: ${response.accepted} |
     Rejected: ${response.rejected} |
-    Model: ${response.model}
+    Model: ${response.model}${response.cached ? " (cached result)" : ""}
   `;
   batchSummary.style.display = "block";
 
@@ -0,0 +1,82 @@
+"""Cost of explain=true against plain scoring.
+
+    python -m tools.bench_explain
+    python -m tools.bench_explain --sizes 1 100 500 --repeat 50 --budget 1.0
+
+For each batch size, times predictor.classify() (what every request pays)
+and PathExplainer.explain() (what explain=true adds). The budget is the
+largest allowed overhead as a fraction of classify time; 1.0 means an
+explained request may take at most twice as long to score. Exits with
+status 1 when any size goes over, so it can gate a model or code change.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from explain import PathExplainer
+from predictor import DATA_PATH, classify, load_model, model_reference
+
+DEFAULT_BUDGET = 1.0
+
+
+def _time(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes=(1, 10, 100, 500), repeat=30, seed=0):
+    model, _ = load_model()
+    reference = model_reference()
+
+    start = time.perf_counter()
+    explainer = PathExplainer(model, reference["sensor_columns"], reference["encoder"].classes_)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Training readings with a little noise, all inside the global envelope
+    X_train = pd.read_csv(DATA_PATH).iloc[:, :-1].values.astype(float)
+    rng = np.random.default_rng(seed)
+
+    report = []
+    for n in sizes:
+        X = X_train[rng.integers(0, len(X_train), n)] + rng.normal(0, 2, (n, X_train.shape[1]))
+        outcome = classify(model, reference, X)
+        classify_ms = _time(lambda: classify(model, reference, X), repeat)
+        explain_ms = _time(lambda: explainer.explain(X, outcome["pred_idx"]), repeat)
+        report.append({
+            "rows": n,
+            "classify_ms": classify_ms,
+            "explain_ms": explain_ms,
+            "overhead": explain_ms / classify_ms,
+        })
+    return build_ms, explainer.nbytes, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark explain=true overhead.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="max explain time as a fraction of classify time")
+    args = parser.parse_args(argv)
+
+    build_ms, nbytes, report = run(args.sizes, args.repeat)
+    print(f"tables built in {build_ms:.0f} ms, {nbytes / 1e6:.1f} MB")
+    print(f"{'rows':>5} {'classify ms':>12} {'explain ms':>11} {'overhead':>9}")
+    over = False
+    for r in report:
+        flag = "" if r["overhead"] <= args.budget else "  OVER BUDGET"
+        over = over or bool(flag)
+        print(f"{r['rows']:>5} {r['classify_ms']:>12.3f} {r['explain_ms']:>11.3f} {r['overhead']:>8.0%}{flag}")
+    print(f"budget: explain <= {args.budget:.0%} of classify")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Payload size and serialization time per response profile.
+
+    python -m tools.bench_serialization
+    python -m tools.bench_serialization --rows 500 --repeat 200
+
+Builds a real /predict-batch payload with app.score_batch() (nothing is
+written to the DB) and times, for each profile, the work the route does
+after scoring: projecting to the profile plus JSON encoding. The stdlib
+row is Flask's stock provider, for reference.
+"""
+import argparse
+import gzip
+import os
+import time
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+os.environ.setdefault("PREDICTION_STORE", "memory")  # importing app must not touch a real DB
+
+import app as app_module  # noqa: E402
+from serialization import FastJSONProvider, compact_batch, compact_prediction, orjson  # noqa: E402
+
+
+def _sample_readings(rows, seed=0):
+    X = app_module.data.iloc[:, :-1].values.astype(float)
+    rng = np.random.default_rng(seed)
+    return X[rng.integers(0, len(X), rows)] + rng.normal(0, 30, (rows, X.shape[1]))
+
+
+def _time(fn, repeat):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+def run(rows=500, repeat=100):
+    flask_app = app_module.app
+    classes = app_module.TEA_REGIONS
+    stdlib = DefaultJSONProvider(flask_app)
+    fast = FastJSONProvider(flask_app)
+
+    batch = app_module.score_batch(_sample_readings(rows))
+    single = next(r for r in batch["results"] if r["status"] == "ACCEPTED")
+    single = {"success": True, "model": "ExtraTrees", **single}
+
+    cases = [
+        ("batch", "full (stdlib)", lambda: stdlib.dumps(batch)),
+        ("batch", "full", lambda: fast.dumps(batch)),
+        ("batch", "compact top_k=3", lambda: fast.dumps(compact_batch(batch, classes, 3, 4))),
+        ("batch", "compact top_k=1 p=3", lambda: fast.dumps(compact_batch(batch, classes, 1, 3))),
+        ("batch", "compact top_k=0", lambda: fast.dumps(compact_batch(batch, classes, 0, 4))),
+        ("single", "full (stdlib)", lambda: stdlib.dumps(single)),
+        ("single", "full", lambda: fast.dumps(single)),
+        ("single", "compact top_k=3", lambda: fast.dumps(compact_prediction(single, classes, 3, 4))),
+        ("single", "compact top_k=0", lambda: fast.dumps(compact_prediction(single, classes, 0, 4))),
+    ]
+
+    report = []
+    for kind, profile, fn in cases:
+        ms, body = _time(fn, repeat)
+        raw = body.encode("utf-8")
+        report.append({
+            "payload": kind,
+            "profile": profile,
+            "ms": round(ms, 4),
+            "bytes": len(raw),
+            "gzip_bytes": len(gzip.compress(raw)),
+        })
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark JSON response profiles.")
+    parser.add_argument("--rows", type=int, default=500, help="rows in the batch payload")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json (orjson not installed)'}")
+    print(f"{'payload':<8} {'profile':<22} {'ms':>9} {'bytes':>9} {'gzip':>8}")
+    for r in run(args.rows, args.repeat):
+        print(f"{r['payload']:<8} {r['profile']:<22} {r['ms']:>9.3f} {r['bytes']:>9} {r['gzip_bytes']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Ingest and query throughput of the prediction-log backends.
+
+    python -m tools.bench_storage
+    python -m tools.bench_storage --single 2000 --uploads 200 --backends sqlite segment
+
+Each backend gets a fresh temporary location and the same workload:
+single /predict-style inserts, then 500-row /predict-batch-style
+uploads, then the dashboard's get_region_statistics() and a full read.
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from data.backends import BACKENDS, create_store
+
+REGIONS = ["DIM", "KAN", "NWE", "RUN", "SB", "UPS", "UVA"]
+
+
+def _row(rng):
+    return {
+        "row_dict": {"sensors": [rng.uniform(500, 13000) for _ in range(7)]},
+        "predicted_region": rng.choice(REGIONS),
+        "confidence": rng.uniform(0.55, 1.0),
+        "status": "ACCEPTED",
+    }
+
+
+def bench_backend(name, single, uploads, rows_per_upload, seed=0):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{name}-")
+    store = create_store(name, os.path.join(workdir, "bench.db"), os.path.join(workdir, "segments"))
+    rng = random.Random(seed)
+    try:
+        store.init()
+        result = {"backend": name}
+
+        rows = [_row(rng) for _ in range(single)]
+        start = time.perf_counter()
+        for r in rows:
+            store.insert_user_prediction(r["row_dict"], r["predicted_region"], r["confidence"], r["status"])
+        result["single_rows_per_s"] = single / (time.perf_counter() - start)
+
+        batches = [[_row(rng) for _ in range(rows_per_upload)] for _ in range(uploads)]
+        start = time.perf_counter()
+        for i, batch in enumerate(batches):
+            store.insert_batch_predictions(f"upload_{i}.csv", batch)
+        result["batch_rows_per_s"] = uploads * rows_per_upload / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        store.get_region_statistics()
+        result["region_stats_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        n = len(store.get_all_batch_predictions())
+        result["read_all_rows_per_s"] = n / (time.perf_counter() - start)
+        return result
+    finally:
+        store.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark prediction-log backends.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--single", type=int, default=1000, help="single-row inserts")
+    parser.add_argument("--uploads", type=int, default=100, help="batch uploads")
+    parser.add_argument("--rows-per-upload", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    results = [
+        bench_backend(name, args.single, args.uploads, args.rows_per_upload)
+        for name in args.backends
+    ]
+
+    print(f"{'backend':<9} {'single rows/s':>14} {'batch rows/s':>14} {'stats ms':>10} {'read rows/s':>13}")
+    for r in results:
+        print(
+            f"{r['backend']:<9} {r['single_rows_per_s']:>14,.0f} {r['batch_rows_per_s']:>14,.0f} "
+            f"{r['region_stats_ms']:>10.2f} {r['read_all_rows_per_s']:>13,.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Offline bulk predictor using the same decision logic as /predict.
+
+    python -m tools.bulk_predict readings.csv -o results.csv
+    python -m tools.bulk_predict readings.npy -o results.csv --workers 8
+    python -m tools.bulk_predict readings.f32 --dtype float32 -o results.csv --probabilities
+
+Input is CSV (the first 7 columns are the sensors), .npy, or raw
+row-major binary with --dtype. The file is read in chunks and the chunks
+are scored in a process pool, one model copy per worker. Only a few
+chunks are in flight at a time, so memory does not grow with the input
+size. Output rows are written in input order:
+
+    row,status,reason,region,confidence[,<region probabilities>...]
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import predictor
+
+N_SENSORS = 7
+
+_worker = {}
+
+
+# --------------------------
+# Worker side
+# --------------------------
+def _init_worker(model_path, data_path, tolerance, threshold, source):
+    model, _ = predictor.load_model(model_path)
+    model.n_jobs = 1  # parallelism comes from the pool
+    _worker.update(
+        model=model,
+        reference=predictor.model_reference(model_path, data_path),
+        tolerance=tolerance,
+        threshold=threshold,
+        source=_open_binary(*source) if source else None,
+    )
+
+
+def _score_chunk(start, X, with_probabilities):
+    if X is None:
+        X = _worker["source"][start[0]:start[1]]
+        start = start[0]
+
+    reference = _worker["reference"]
+    outcome = predictor.classify(
+        _worker["model"], reference, X, _worker["tolerance"], _worker["threshold"]
+    )
+
+    reason = outcome["reason"]
+    accepted = reason == None  # noqa: E711 - elementwise on an object array
+    regions = np.append(reference["encoder"].classes_.astype(object), "")
+    columns = {
+        "row": np.arange(start, start + len(X)),
+        "status": np.where(accepted, "ACCEPTED", "REJECTED"),
+        "reason": np.where(accepted, "", reason),
+        "region": regions[outcome["pred_idx"]],  # -1 -> ""
+        "confidence": outcome["confidence"],
+    }
+    if with_probabilities:
+        for i, name in enumerate(reference["encoder"].classes_):
+            columns[f"p_{name}"] = outcome["probabilities"][:, i]
+
+    text = pd.DataFrame(columns).to_csv(index=False, header=False, float_format="%.6g")
+    counts = Counter(r if r is not None else "ACCEPTED" for r in reason)
+    return text, len(X), counts
+
+
+# --------------------------
+# Input
+# --------------------------
+def _open_binary(path, dtype):
+    if path.endswith(".npy"):
+        arr = np.load(path, mmap_mode="r")
+    else:
+        arr = np.memmap(path, dtype=dtype, mode="r").reshape(-1, N_SENSORS)
+    if arr.ndim != 2 or arr.shape[1] != N_SENSORS:
+        raise ValueError(f"expected an (n, {N_SENSORS}) array, got {arr.shape}")
+    return arr
+
+
+def iter_tasks(path, chunk_size, dtype, no_header):
+    """Yield (start, X) for CSV, or ((start, stop), None) for memory-mapped input."""
+    if path.endswith(".csv") or path.endswith(".csv.gz"):
+        reader = pd.read_csv(
+            path, usecols=range(N_SENSORS), chunksize=chunk_size,
+            header=None if no_header else 0, dtype=float
+        )
+        start = 0
+        for chunk in reader:
+            yield start, chunk.values
+            start += len(chunk)
+    else:
+        n = len(_open_binary(path, dtype))
+        for start in range(0, n, chunk_size):
+            yield (start, min(start + chunk_size, n)), None
+
+
+# --------------------------
+# Driver
+# --------------------------
+def run(input_path, output_path, chunk_size=100_000, workers=None, dtype="float64",
+        no_header=False, with_probabilities=False, tolerance=predictor.TOLERANCE,
+        threshold=predictor.CONFIDENCE_THRESHOLD, model_path=predictor.MODEL_PATH,
+        data_path=predictor.DATA_PATH, progress=True):
+    workers = workers or os.cpu_count() or 1
+    is_csv = input_path.endswith(".csv") or input_path.endswith(".csv.gz")
+    source = None if is_csv else (input_path, dtype)
+
+    columns = ["row", "status", "reason", "region", "confidence"]
+    if with_probabilities:
+        columns += [f"p_{r}" for r in predictor.model_reference(model_path, data_path)["encoder"].classes_]
+
+    totals = Counter()
+    rows_done = 0
+    start_time = time.perf_counter()
+
+    out = sys.stdout if output_path == "-" else open(output_path, "w", newline="")
+    try:
+        out.write(",".join(columns) + "\n")
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(model_path, data_path, tolerance, threshold, source),
+        ) as pool:
+            pending = deque()
+
+            def drain_one():
+                nonlocal rows_done
+                text, n, counts = pending.popleft().result()
+                out.write(text)
+                totals.update(counts)
+                rows_done += n
+                if progress:
+                    rate = rows_done / (time.perf_counter() - start_time)
+                    print(f"\r{rows_done:,} rows  {rate:,.0f} rows/s", end="", file=sys.stderr)
+
+            for start, X in iter_tasks(input_path, chunk_size, dtype, no_header):
+                # Bounded window keeps memory flat regardless of input size
+                if len(pending) >= 2 * workers:
+                    drain_one()
+                pending.append(pool.submit(_score_chunk, start, X, with_probabilities))
+            while pending:
+                drain_one()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start_time
+    if progress:
+        print(file=sys.stderr)
+    return {
+        "rows": rows_done,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(rows_done / elapsed) if elapsed else None,
+        "workers": workers,
+        "outcomes": dict(totals),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score sensor readings in bulk.")
+    parser.add_argument("input", help=".csv, .csv.gz, .npy or raw binary file")
+    parser.add_argument("-o", "--output", default="-", help="output CSV (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, help="processes (default: all cores)")
+    parser.add_argument("--dtype", default="float64", help="element type of raw binary input")
+    parser.add_argument("--no-header", action="store_true", help="CSV input has no header row")
+    parser.add_argument("--probabilities", action="store_true", help="add one column per region")
+    parser.add_argument("--tolerance", type=float, default=predictor.TOLERANCE)
+    parser.add_argument("--threshold", type=float, default=predictor.CONFIDENCE_THRESHOLD)
+    parser.add_argument("--model", default=predictor.MODEL_PATH)
+    parser.add_argument("--reference", default=predictor.DATA_PATH,
+                        help="training CSV for the encoder and envelopes when the model has no .json")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    summary = run(
+        args.input, args.output, args.chunk_size, args.workers, args.dtype,
+        args.no_header, args.probabilities, args.tolerance, args.threshold,
+        args.model, args.reference, progress=not args.quiet,
+    )
+    print(
+        f"{summary['rows']:,} rows in {summary['elapsed_s']} s "
+        f"({summary['rows_per_s']:,} rows/s, {summary['workers']} workers) {summary['outcomes']}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
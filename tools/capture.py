@@ -0,0 +1,194 @@
+"""Opt-in WSGI middleware that records incoming requests to JSONL.
+
+Enabled from app.py when CAPTURE_DIR is set. Each sampled request is
+written as one JSON line with its method, route, body (dropped above
+max_body_bytes), status, timing and response, which is what
+`python -m tools.replay` needs to send it again. Files rotate by size and
+only the newest max_files per worker are kept.
+
+Capturing never changes what the app receives. A body over max_body_bytes
+is not read at all when Content-Length says so. A chunked body is read
+only on a terminated wsgi.input, and only up to max_body_bytes + 1; the
+rest is streamed through to the app.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import random
+import threading
+import time
+
+# Never written to disk
+SKIPPED_HEADERS = {"HTTP_AUTHORIZATION", "HTTP_COOKIE", "HTTP_X_PROFILE_TOKEN"}
+
+
+class RotatingJSONLWriter:
+    def __init__(self, directory, max_file_bytes=50 * 1024 * 1024, max_files=20):
+        self.directory = directory
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _prefix(self):
+        return f"capture-{os.getpid()}-"
+
+    def _open_new(self):
+        if self._file is not None:
+            self._file.close()
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.directory, f"{self._prefix()}{stamp}-{time.time_ns() % 10**6:06d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self._prune()
+
+    def _prune(self):
+        own = sorted(n for n in os.listdir(self.directory) if n.startswith(self._prefix()))
+        for name in own[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None or self._file.tell() + len(line) > self.max_file_bytes:
+                self._open_new()
+            self._file.write(line)
+            self._file.flush()
+
+
+class _PrefixedInput(io.RawIOBase):
+    """wsgi.input that replays the bytes already read, then the rest of the stream."""
+
+    def __init__(self, prefix, stream):
+        self._prefix = memoryview(prefix)
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        data = self._stream.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _read_up_to(stream, limit):
+    chunks, size = [], 0
+    while size < limit:
+        chunk = stream.read(limit - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b"".join(chunks)
+
+
+def _encode_body(data, max_bytes):
+    if len(data) > max_bytes:
+        return {"body_truncated": True}
+    try:
+        return {"body": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_b64": base64.b64encode(data).decode("ascii")}
+
+
+class CaptureMiddleware:
+    def __init__(self, wsgi_app, capture_dir, sample_rate=1.0, max_body_bytes=256 * 1024,
+                 path_prefixes=None, exclude_prefixes=("/static",), **writer_kwargs):
+        self.wsgi_app = wsgi_app
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self.path_prefixes = tuple(path_prefixes) if path_prefixes else None
+        self.exclude_prefixes = tuple(exclude_prefixes)
+        self.writer = RotatingJSONLWriter(capture_dir, **writer_kwargs)
+
+    def _should_capture(self, path):
+        if path.startswith(self.exclude_prefixes):
+            return False
+        if self.path_prefixes and not path.startswith(self.path_prefixes):
+            return False
+        return random.random() < self.sample_rate
+
+    def _record_body(self, environ):
+        """Body fields of the record. The app still receives every byte it would have."""
+        stream = environ["wsgi.input"]
+        length = environ.get("CONTENT_LENGTH")
+        if length:
+            length = int(length)
+            if length > self.max_body_bytes:
+                # Not recorded, so not read: the app (or its 413) gets the stream untouched
+                return {"body_size": length, "body_truncated": True}
+            body = _read_up_to(stream, length)
+            environ["wsgi.input"] = io.BytesIO(body)
+            return {"body_size": length, **_encode_body(body, self.max_body_bytes)}
+
+        # No length (chunked): reading to EOF is only safe on a terminated stream
+        if not environ.get("wsgi.input_terminated"):
+            return {"body_size": None}
+        head = _read_up_to(stream, self.max_body_bytes + 1)
+        if len(head) > self.max_body_bytes:
+            environ["wsgi.input"] = _PrefixedInput(head, stream)
+            return {"body_size": None, "body_truncated": True}
+        environ["wsgi.input"] = io.BytesIO(head)
+        return {"body_size": len(head), **_encode_body(head, self.max_body_bytes)}
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if not self._should_capture(path):
+            return self.wsgi_app(environ, start_response)
+
+        body = self._record_body(environ)
+
+        captured = {}
+
+        def _start_response(status, headers, exc_info=None):
+            captured["status"] = int(status.split(" ", 1)[0])
+            return start_response(status, headers, exc_info)
+
+        ts = time.time()
+        start = time.perf_counter()
+        app_iter = self.wsgi_app(environ, _start_response)
+        try:
+            chunks = list(app_iter)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        duration_ms = (time.perf_counter() - start) * 1000
+        response = b"".join(chunks)
+
+        record = {
+            "ts": ts,
+            "method": environ.get("REQUEST_METHOD"),
+            "path": path,
+            "query": environ.get("QUERY_STRING", ""),
+            "content_type": environ.get("CONTENT_TYPE", ""),
+            "headers": {
+                k[5:].replace("_", "-").title(): v
+                for k, v in environ.items()
+                if k.startswith("HTTP_") and k not in SKIPPED_HEADERS
+            },
+            **body,
+            "status": captured.get("status"),
+            "duration_ms": round(duration_ms, 3),
+            "response_size": len(response),
+            "response_sha256": hashlib.sha256(response).hexdigest(),
+        }
+        if len(response) <= self.max_body_bytes:
+            record["response"] = response.decode("utf-8", errors="replace")
+
+        try:
+            self.writer.write(record)
+        except OSError as e:
+            print(f"[WARN] Capture write failed: {e}")
+
+        return chunks
@@ -0,0 +1,255 @@
+"""Replay a traffic capture against a running server.
+
+    python -m tools.replay captures/ --target http://127.0.0.1:5000
+    python -m tools.replay captures/ --speed 4 --concurrency 16
+    python -m tools.replay captures/capture-123-*.jsonl --max --concurrency 32
+
+Requests are sent in their original order. By default they keep their
+original spacing. --speed scales that spacing, and --max sends as fast
+as the workers allow. The report shows throughput, latency percentiles
+(replayed and recorded) and every response whose status or JSON body
+differs from the capture.
+"""
+import argparse
+import base64
+import glob
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Hop-by-hop / per-connection headers that must not be replayed verbatim
+DROPPED_HEADERS = {"Host", "Content-Length", "Connection", "Transfer-Encoding"}
+
+
+# --------------------------
+# Loading
+# --------------------------
+def load_capture(paths):
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(glob.glob(os.path.join(p, "*.jsonl")))
+        else:
+            files.extend(glob.glob(p))
+
+    records = []
+    for path in sorted(files):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+
+    records.sort(key=lambda r: r["ts"])
+    return records
+
+
+def _request_body(record):
+    if "body" in record:
+        return record["body"].encode("utf-8")
+    if "body_b64" in record:
+        return base64.b64decode(record["body_b64"])
+    return None
+
+
+# --------------------------
+# Sending
+# --------------------------
+class Sender:
+    def __init__(self, target, timeout=30):
+        parts = urlsplit(target)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = cls(self.netloc, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def send(self, record, body):
+        url = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        headers = {k: v for k, v in record.get("headers", {}).items() if k not in DROPPED_HEADERS}
+        if record.get("content_type"):
+            headers["Content-Type"] = record["content_type"]
+
+        start = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.request(record["method"], url, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+            status = resp.status
+        except (OSError, http.client.HTTPException) as e:
+            self._local.conn = None
+            return {"error": str(e), "latency_ms": (time.perf_counter() - start) * 1000}
+        return {
+            "status": status,
+            "body": data,
+            "latency_ms": (time.perf_counter() - start) * 1000,
+        }
+
+
+# --------------------------
+# Comparison
+# --------------------------
+def _json_or_none(text):
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def diff_response(record, result, ignore_keys=()):
+    """Return a short description of how the replayed response differs, or None."""
+    if result["status"] != record.get("status"):
+        return f"status {record.get('status')} -> {result['status']}"
+
+    if "response" not in record:
+        return None  # response was too large to keep; status match is all we can check
+
+    old = _json_or_none(record["response"])
+    new = _json_or_none(result["body"].decode("utf-8", errors="replace"))
+    if old is None or new is None:
+        return None if record["response"].encode("utf-8") == result["body"] else "body differs"
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        keys = (set(old) | set(new)) - set(ignore_keys)
+        changed = sorted(k for k in keys if old.get(k) != new.get(k))
+        return f"keys differ: {', '.join(changed)}" if changed else None
+
+    return None if old == new else "body differs"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+# --------------------------
+# Replay
+# --------------------------
+def replay(records, target, speed=1.0, max_speed=False, concurrency=4, ignore_keys=(), timeout=30):
+    sender = Sender(target, timeout)
+    sendable = [(r, _request_body(r)) for r in records if not r.get("body_truncated")]
+    skipped = len(records) - len(sendable)
+
+    outcomes = [None] * len(sendable)
+    first_ts = sendable[0][0]["ts"] if sendable else 0
+
+    def run(i, record, body):
+        try:
+            outcomes[i] = sender.send(record, body)
+        except Exception as e:  # anything send() doesn't handle still counts as an error
+            outcomes[i] = {"error": f"{type(e).__name__}: {e}", "latency_ms": None}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, (record, body) in enumerate(sendable):
+            if not max_speed:
+                due = (record["ts"] - first_ts) / speed
+                wait = due - (time.perf_counter() - start)
+                if wait > 0:
+                    time.sleep(wait)
+            pool.submit(run, i, record, body)
+    elapsed = time.perf_counter() - start
+
+    latencies = []
+    errors = 0
+    diffs = []
+    per_route = Counter()
+    for (record, _), outcome in zip(sendable, outcomes):
+        per_route[f"{record['method']} {record['path']}"] += 1
+        if "error" in outcome:
+            errors += 1
+            diffs.append((record, f"error: {outcome['error']}"))
+            continue
+        latencies.append(outcome["latency_ms"])
+        difference = diff_response(record, outcome, ignore_keys)
+        if difference:
+            diffs.append((record, difference))
+
+    latencies.sort()
+    recorded = sorted(r["duration_ms"] for r, _ in sendable if r.get("duration_ms") is not None)
+
+    return {
+        "sent": len(sendable),
+        "skipped_truncated": skipped,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(sendable) / elapsed, 2) if elapsed else None,
+        "latency_ms": {f"p{p}": _round(percentile(latencies, p)) for p in (50, 90, 95, 99, 100)},
+        "recorded_latency_ms": {f"p{p}": _round(percentile(recorded, p)) for p in (50, 90, 95, 99, 100)},
+        "per_route": dict(per_route),
+        "mismatches": len(diffs),
+        "mismatch_examples": [
+            {"ts": r["ts"], "route": f"{r['method']} {r['path']}", "diff": d} for r, d in diffs[:20]
+        ],
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def print_report(report, out=sys.stdout):
+    print(f"Sent:        {report['sent']} (skipped {report['skipped_truncated']} truncated)", file=out)
+    print(f"Errors:      {report['errors']}", file=out)
+    print(f"Elapsed:     {report['elapsed_s']} s", file=out)
+    print(f"Throughput:  {report['throughput_rps']} req/s", file=out)
+    print("Latency ms:  " + "  ".join(f"{k}={v}" for k, v in report["latency_ms"].items()), file=out)
+    print("Recorded ms: " + "  ".join(f"{k}={v}" for k, v in report["recorded_latency_ms"].items()), file=out)
+    for route, count in sorted(report["per_route"].items()):
+        print(f"  {route}: {count}", file=out)
+    print(f"Mismatches:  {report['mismatches']}", file=out)
+    for m in report["mismatch_examples"]:
+        print(f"  {m['ts']:.3f} {m['route']}: {m['diff']}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured traffic against a server.")
+    parser.add_argument("paths", nargs="+", help="capture files, globs or directories")
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="time scale, 2 = twice as fast as recorded")
+    parser.add_argument("--max", dest="max_speed", action="store_true",
+                        help="ignore recorded spacing and send as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, help="replay only the first N requests")
+    parser.add_argument("--ignore-key", action="append", default=[],
+                        help="top-level JSON key to ignore when comparing responses")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be greater than 0")
+
+    records = load_capture(args.paths)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        parser.error("no captured requests found")
+
+    report = replay(records, args.target, args.speed, args.max_speed,
+                    args.concurrency, args.ignore_key, args.timeout)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
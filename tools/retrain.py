@@ -0,0 +1,227 @@
+"""Incremental retraining from ACCEPTED production predictions.
+
+    python -m tools.retrain
+    python -m tools.retrain --add-trees 50 --chunk-size 5000
+    PREDICTION_STORE=segment python -m tools.retrain --base tea_models_project/models/ExtraTrees_<stamp>.pkl
+
+The labels come from the serving model: the region it predicted for rows
+that passed all three checks. Each run:
+  1. splits the curated CSV exactly as train_model.py does (test_size=0.2,
+     random_state=42, stratified). The 20% holdout is the same every run
+     and is never trained on. Production readings identical to a holdout
+     reading are dropped, and so are repeats.
+  2. streams ACCEPTED rows out of the prediction store (PREDICTION_STORE)
+     in chunks.
+  3. grows --add-trees new trees on the training split plus those rows,
+     using warm_start on all cores. The existing trees are kept as they
+     are, so a run costs the new trees only.
+  4. scores the base model and the candidate on the holdout.
+  5. writes MODELS_DIR/ExtraTrees_<stamp>.pkl and ExtraTrees_<stamp>.json.
+     The JSON holds the envelopes of the curated CSV, the holdout
+     metrics, row counts, wall-clock time and peak memory. Production rows
+     never widen the envelopes: they were accepted inside them +- TOLERANCE,
+     so folding them in would let each run stretch the checks a bit more.
+
+Serve a candidate with MODEL_PATH=<pkl>. app.py picks up the JSON next to it.
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+
+import predictor
+from data import db
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODELS_DIR = os.path.join(predictor.BASE_DIR, "tea_models_project", "models")
+ADD_TREES = 20
+CHUNK_SIZE = 5000
+
+
+# --------------------------
+# Data
+# --------------------------
+def split_training_data(data_path):
+    """Encoder, train split and fixed holdout of the curated CSV (as train_model.py)."""
+    data = pd.read_csv(data_path)
+    reference = predictor.build_reference(data)
+    X = data.iloc[:, :-1].values.astype(float)
+    y = reference["encoder"].transform(data.iloc[:, -1].values)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    return reference, (X_train, y_train), (X_test, y_test)
+
+
+def collect_production_rows(classes, holdout, chunk_size=CHUNK_SIZE, max_rows=None):
+    """Accepted readings and labels from the store, without holdout rows or repeats."""
+    class_index = {name: i for i, name in enumerate(classes)}
+    holdout_rows = {tuple(row) for row in holdout.tolist()}
+    seen = set()
+    X, y = [], []
+    counts = {"streamed": 0, "unknown_region": 0, "in_holdout": 0, "duplicate": 0, "chunks": 0}
+
+    for X_chunk, regions in db.iter_accepted_readings(chunk_size):
+        counts["chunks"] += 1
+        counts["streamed"] += len(regions)
+        for row, region in zip(X_chunk.tolist(), regions):
+            key = tuple(row)
+            if region not in class_index:
+                counts["unknown_region"] += 1
+            elif key in holdout_rows:
+                counts["in_holdout"] += 1
+            elif key in seen:
+                counts["duplicate"] += 1
+            else:
+                seen.add(key)
+                X.append(row)
+                y.append(class_index[region])
+        if max_rows and len(X) >= max_rows:
+            X, y = X[:max_rows], y[:max_rows]
+            break
+
+    counts["used"] = len(X)
+    return np.array(X, dtype=float).reshape(-1, len(holdout[0])), np.array(y, dtype=np.int64), counts
+
+
+# --------------------------
+# Training
+# --------------------------
+def grow(model, X, y, add_trees):
+    """Add add_trees trees fitted on (X, y); existing trees are untouched."""
+    n_jobs = model.n_jobs
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees, n_jobs=-1)
+    model.fit(X, y)
+    # Serving scores one reading at a time, where a thread pool only adds overhead
+    model.set_params(warm_start=False, n_jobs=n_jobs)
+    return model
+
+
+def evaluate(model, X_test, y_test):
+    y_pred = model.predict(X_test)
+    return {
+        "accuracy": round(float(accuracy_score(y_test, y_pred)), 4),
+        "f1_weighted": round(float(f1_score(y_test, y_pred, average="weighted")), 4),
+        "n_estimators": len(model.estimators_),
+    }
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS
+
+
+# --------------------------
+# Run
+# --------------------------
+def retrain(base_path=predictor.MODEL_PATH, data_path=predictor.DATA_PATH, models_dir=MODELS_DIR,
+            add_trees=ADD_TREES, chunk_size=CHUNK_SIZE, max_rows=None, min_rows=1):
+    tracemalloc.start()
+    started = time.perf_counter()
+    timings = {}
+
+    def lap(name, since):
+        timings[name] = round(time.perf_counter() - since, 3)
+        return time.perf_counter()
+
+    t = time.perf_counter()
+    with open(base_path, "rb") as f:
+        base_bytes = f.read()
+    base = pickle.loads(base_bytes)
+    candidate = pickle.loads(base_bytes)
+    base_version = hashlib.sha256(base_bytes).hexdigest()[:16]
+    reference, (X_train, y_train), (X_test, y_test) = split_training_data(data_path)
+    classes = reference["encoder"].classes_
+    t = lap("load_s", t)
+
+    X_new, y_new, counts = collect_production_rows(classes, X_test, chunk_size, max_rows)
+    t = lap("stream_s", t)
+    print(f"[INFO] {counts['used']} production rows from {counts['chunks']} chunks {counts}")
+    if counts["used"] < min_rows:
+        print(f"[INFO] Fewer than {min_rows} new rows; no candidate built")
+        tracemalloc.stop()
+        return None
+
+    grow(candidate, np.vstack([X_train, X_new]), np.concatenate([y_train, y_new]), add_trees)
+    t = lap("fit_s", t)
+
+    metrics = {"base": evaluate(base, X_test, y_test), "candidate": evaluate(candidate, X_test, y_test)}
+    t = lap("evaluate_s", t)
+
+    os.makedirs(models_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    model_path = os.path.join(models_dir, f"ExtraTrees_{stamp}.pkl")
+    model_bytes = pickle.dumps(candidate)
+    with open(model_path, "wb") as f:
+        f.write(model_bytes)
+    t = lap("publish_s", t)
+
+    timings["total_s"] = round(time.perf_counter() - started, 3)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    run = {
+        "version": hashlib.sha256(model_bytes).hexdigest()[:16],  # == app MODEL_VERSION
+        "base_version": base_version,
+        "base_path": os.path.abspath(base_path),
+        "created_at": stamp,
+        "added_trees": add_trees,
+        "rows": {"csv_train": len(X_train), "holdout": len(X_test), **counts},
+        "holdout": metrics,
+        "wall_clock": timings,
+        "memory": {
+            "tracemalloc_peak_mb": round(traced_peak / 1e6, 1),
+            "max_rss_mb": _max_rss_mb(),
+        },
+    }
+    predictor.save_envelope(predictor.envelope_path(model_path), reference, run=run)
+    return model_path, run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow the ensemble on accepted production rows.")
+    parser.add_argument("--base", default=predictor.MODEL_PATH, help="model to extend")
+    parser.add_argument("--data", default=predictor.DATA_PATH, help="curated training CSV")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--add-trees", type=int, default=ADD_TREES)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per store read")
+    parser.add_argument("--max-rows", type=int, help="cap on production rows used")
+    parser.add_argument("--min-rows", type=int, default=1, help="skip the run below this many rows")
+    parser.add_argument("--json", action="store_true", help="print the run report as JSON")
+    args = parser.parse_args(argv)
+
+    result = retrain(args.base, args.data, args.models_dir, args.add_trees,
+                     args.chunk_size, args.max_rows, args.min_rows)
+    if result is None:
+        return
+    model_path, run = result
+
+    if args.json:
+        print(json.dumps({"model_path": model_path, **run}, indent=2))
+        return
+    base, cand = run["holdout"]["base"], run["holdout"]["candidate"]
+    print(f"Published {model_path} (version {run['version']})")
+    print(f"  holdout accuracy {base['accuracy']:.4f} -> {cand['accuracy']:.4f}, "
+          f"F1 {base['f1_weighted']:.4f} -> {cand['f1_weighted']:.4f}, "
+          f"trees {base['n_estimators']} -> {cand['n_estimators']}")
+    print(f"  wall clock {run['wall_clock']}")
+    print(f"  peak memory {run['memory']}")
+
+
+if __name__ == "__main__":
+    main()